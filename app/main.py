@@ -6,6 +6,7 @@ attribute (an instance of ToolkitPlugin).  They are loaded alphabetically
 and sorted by their `order` field.
 """
 
+import asyncio
 import importlib
 import os
 import pkgutil
@@ -56,10 +57,10 @@ async def _lifespan(app: FastAPI):
         except Exception as exc:
             print(f"[warn] Plugin {p.id} startup error: {exc}")
     yield
-    # Shutdown
+    # Shutdown – plugins may persist state to disk; keep that off the loop
     for p in _plugins:
         try:
-            p.shutdown()
+            await asyncio.to_thread(p.shutdown)
         except Exception as exc:
             print(f"[warn] Plugin {p.id} shutdown error: {exc}")
 
@@ -4,10 +4,12 @@ COM Unlocker plugin – Identify and kill processes locking COM ports.
 
 from __future__ import annotations
 
+import asyncio
 import os
 import re
 import subprocess
 import sys
+from functools import lru_cache
 
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
@@ -18,7 +20,9 @@ ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)
 HANDLE_TOOL = os.path.join(ROOT, "com-killer", "handle64.exe")
 
 
+@lru_cache(maxsize=1)
 def _is_admin() -> bool:
+    # A process cannot gain/lose elevation while running – query once.
     if os.name != "nt":
         return False
     try:
@@ -142,16 +146,19 @@ class COMUnlockerPlugin(ToolkitPlugin):
                 "handle_path": HANDLE_TOOL,
             }
 
+        # Port enumeration, handle64, serial probes and pnputil all block for
+        # up to seconds – run them on worker threads, not the event loop
+
         @app.get("/api/com/ports")
         async def com_ports():
-            return _list_com_ports()
+            return await asyncio.to_thread(_list_com_ports)
 
         @app.get("/api/com/scan/{port}")
         async def com_scan(port: str):
             if not os.path.exists(HANDLE_TOOL):
                 raise HTTPException(500, "handle64.exe not found")
-            result = _scan_port(port)
-            accessible, msg = _probe_port(port)
+            result = await asyncio.to_thread(_scan_port, port)
+            accessible, msg = await asyncio.to_thread(_probe_port, port)
             return {
                 "locked": result is not None,
                 "process": result,
@@ -161,12 +168,12 @@ class COMUnlockerPlugin(ToolkitPlugin):
 
         @app.post("/api/com/kill/{pid}")
         async def com_kill(pid: int):
-            ok, msg = _kill_pid(pid)
+            ok, msg = await asyncio.to_thread(_kill_pid, pid)
             return {"ok": ok, "msg": msg}
 
         @app.post("/api/com/restart/{port}")
         async def com_restart(port: str):
-            ok, msg = _restart_device(port)
+            ok, msg = await asyncio.to_thread(_restart_device, port)
             return {"ok": ok, "msg": msg}
 
         @app.post("/api/com/launch_admin")
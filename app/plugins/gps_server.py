@@ -8,6 +8,7 @@ WebSocket at /ws/gps for real-time push.
 from __future__ import annotations
 
 import asyncio
+import functools
 import json
 import os
 import sys
@@ -22,6 +23,11 @@ from pydantic import BaseModel
 from app.plugins.base import ToolkitPlugin
 from app import config
 
+try:
+    import orjson
+except ImportError:  # optional – stdlib json is used as fallback
+    orjson = None
+
 # Import core Teltonika server (kept as-is from original codebase)
 ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 if ROOT not in sys.path:
@@ -37,48 +43,143 @@ from server_app.teltonika_server import (
 )
 
 
+def _dumps(obj, pretty: bool = False) -> str:
+    """Serialise for WS pushes / downloads; orjson when installed.
+
+    Datetimes are passed through to ``default=str`` so both paths emit the
+    same text the stdlib fallback always has.
+    """
+    if orjson is not None:
+        opt = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if pretty:
+            opt |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=str, option=opt).decode()
+    return json.dumps(obj, indent=2 if pretty else None, default=str)
+
+
 # ── Singleton server instance ───────────────────────────────────────
 
 _server: TeltonikaServer | None = None
 _server_lock = threading.Lock()
 
 
+def _log_max_lines(cfg: dict) -> int:
+    """Server log ring size from settings (floor of 100 lines)."""
+    try:
+        return max(100, int(cfg.get("log_max_lines", 1000)))
+    except (ValueError, TypeError):
+        return 1000
+
+
+def _new_server(cfg: dict, port: int, protocol: str) -> TeltonikaServer:
+    """Construct a server with the UI-tunable settings from *cfg* applied."""
+    srv = TeltonikaServer(port=port, protocol=protocol)
+    srv.max_log_lines = _log_max_lines(cfg)
+    return srv
+
+
 def _get_server() -> TeltonikaServer:
     global _server
+    srv = _server
+    if srv is not None:  # hot path – every route and the push thread land here
+        return srv
     with _server_lock:
         if _server is None:
             cfg = config.load()
-            _server = TeltonikaServer(
-                port=cfg.get("server_port", 8000),
-                protocol=cfg.get("server_protocol", "TCP"),
-            )
+            _server = _new_server(cfg, cfg.get("server_port", 8000),
+                                  cfg.get("server_protocol", "TCP"))
         return _server
 
 
 def _replace_server(port: int, protocol: str) -> TeltonikaServer:
     global _server
     with _server_lock:
-        if _server and _server.running:
-            _server.stop()
+        old = _server
+        if old and old.running:
+            old.stop()
             time.sleep(0.3)
-        _server = TeltonikaServer(port=port, protocol=protocol)
+        _server = _new_server(config.load(), port, protocol)
+        if old is not None:
+            old.data_event.set()   # _ws_push_loop may be waiting on it – re-fetch now
         return _server
 
 
+# ── IO name resolution ─────────────────────────────────────────────
+
+@functools.lru_cache(maxsize=4096)
+def _io_label(key) -> str:
+    """Display name for an IO_Data key (int when live, str after state reload)."""
+    if isinstance(key, int):
+        return io_name(key)
+    s = str(key)
+    # Non-numeric keys are a plain miss, not an error – no exception round-trip
+    return io_name(int(s)) if s.isascii() and s.isdigit() else s
+
+
+def _named_io(io_data: dict) -> dict:
+    return {_io_label(k): v for k, v in io_data.items()}
+
+
+# id(record) → (record, IO_Named).  Stored records are never modified after
+# ingest, so each one's named view is built once and then shared by every
+# status push and listing.  Holding the record keeps its id from being reused.
+_named_cache: dict[int, tuple[dict, dict]] = {}
+_NAMED_CACHE_MAX = 8192
+
+
+def _with_io_named(rec: dict) -> dict:
+    """Overlay IO_Named on a stored record without copying/mutating it otherwise."""
+    if 'IO_Data' not in rec:
+        return rec
+    hit = _named_cache.get(id(rec))
+    if hit is None or hit[0] is not rec:
+        if len(_named_cache) >= _NAMED_CACHE_MAX:
+            _named_cache.clear()
+        hit = _named_cache[id(rec)] = (rec, _named_io(rec['IO_Data']))
+    return {**rec, 'IO_Named': hit[1]}
+
+
+@functools.lru_cache(maxsize=1024)
+def _annotate(hex_str: str, protocol: str) -> list[dict]:
+    """annotate_packet() memoized – a recorded raw packet never changes."""
+    return annotate_packet(hex_str, protocol)
+
+
+def _annotate_all(msgs: list[dict]) -> list[dict]:
+    """Raw entries with annotations overlaid – the stored dicts stay annotation-free."""
+    out = []
+    for m in msgs:
+        try:
+            ann = _annotate(m.get("hex", ""), m.get("protocol", "TCP"))
+        except Exception:
+            ann = []
+        out.append({**m, "annotations": ann})
+    return out
+
+
+def _reload_io_names(path: str) -> str | None:
+    """refresh_io_names() + drop cached labels.  Returns error string or None."""
+    err = refresh_io_names(path)
+    _io_label.cache_clear()
+    _named_cache.clear()
+    _annotate.cache_clear()
+    return err
+
+
 # ── WebSocket hub ───────────────────────────────────────────────────
 
 _ws_clients: set[WebSocket] = set()
 
 
-async def _broadcast(data: dict):
+async def _broadcast(msg: str):
+    """Send an already-serialised message to every client."""
     dead = set()
-    msg = json.dumps(data, default=str)
     for ws in list(_ws_clients):
         try:
             await ws.send_text(msg)
         except Exception:
             dead.add(ws)
-    _ws_clients -= dead
+    _ws_clients.difference_update(dead)
 
 
 _main_loop: asyncio.AbstractEventLoop | None = None
@@ -88,21 +189,44 @@ def _ws_push_loop():
     """Background thread that pushes server changes to WebSocket clients."""
     srv = _get_server()
     last_ver = srv.data_version
+    pending = None  # broadcast future still being written, if any
+    next_push = 0.0
 
     while True:
-        time.sleep(0.8)
         srv = _get_server()  # re-fetch in case replaced
+        # Sleep until the server flags new data rather than waking to poll;
+        # _replace_server() sets the old server's event to move us over
+        srv.data_event.wait(timeout=5.0)
+        srv.data_event.clear()
+        # At most one snapshot per 0.8 s – a burst of packets lands in one push
+        delay = next_push - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        srv = _get_server()
         cur = srv.data_version
         if cur == last_ver or not _ws_clients:
             continue
+        # Each push is a full snapshot, so a newer one supersedes any backlog:
+        # while the previous send is in flight, coalesce instead of queueing.
+        if pending is not None and not pending.done():
+            srv.data_event.set()   # still unsent – look again next round
+            next_push = time.monotonic() + 0.8
+            continue
         last_ver = cur
+        next_push = time.monotonic() + 0.8
 
-        payload = _build_status(srv)
         loop = _main_loop
         if loop is None or loop.is_closed():
             continue
+        # Build + serialise here so the event loop only does the socket writes;
+        # a failure skips this push but must not end the thread
+        try:
+            msg = _dumps(_build_status(srv))
+        except Exception as e:
+            print(f"  [gps] WS status build failed: {e}")
+            continue
         try:
-            asyncio.run_coroutine_threadsafe(_broadcast(payload), loop)
+            pending = asyncio.run_coroutine_threadsafe(_broadcast(msg), loop)
         except Exception:
             pass
 
@@ -121,20 +245,7 @@ def _build_status(srv: TeltonikaServer) -> dict:
         }
     
     def _enhance(recs):
-        out = []
-        for r in recs:
-            nr = r.copy()
-            if 'IO_Data' in r:
-                named = {}
-                for k, v in r['IO_Data'].items():
-                    try:
-                        kid = int(k)
-                    except (ValueError, TypeError):
-                        kid = None
-                    named[io_name(kid) if kid is not None else str(k)] = v
-                nr['IO_Named'] = named
-            out.append(nr)
-        return out
+        return [_with_io_named(r) for r in recs]
 
     with srv.lock:
         return {
@@ -178,6 +289,7 @@ class ServerSettings(BaseModel):
     port: Optional[int] = None
     protocol: Optional[str] = None
     avl_ids_path: Optional[str] = None
+    log_max_lines: Optional[int] = None
 
 
 # ── Plugin ──────────────────────────────────────────────────────────
@@ -202,7 +314,7 @@ class GPSServerPlugin(ToolkitPlugin):
         avl = cfg.get("avl_ids_path", "")
         if avl:
             if os.path.isfile(avl):
-                err = refresh_io_names(avl)
+                err = _reload_io_names(avl)
                 if err:
                     print(f"  [gps] AVL IDs load error: {err}")
                 else:
@@ -224,8 +336,8 @@ class GPSServerPlugin(ToolkitPlugin):
         print(f"  [gps] WebSocket push thread started")
 
     def shutdown(self):
-        srv = _get_server()
-        if srv.running:
+        srv = _server  # never built → nothing to stop; don't construct one now
+        if srv is not None and srv.running:
             srv.stop()
 
     def register_routes(self, app: FastAPI):
@@ -246,13 +358,15 @@ class GPSServerPlugin(ToolkitPlugin):
         @app.post("/api/gps/stop")
         async def gps_stop():
             srv = _get_server()
-            srv.stop()
+            # stop() writes the state file – don't stall the event loop on it
+            await asyncio.to_thread(srv.stop)
             return {"ok": True}
 
         @app.post("/api/gps/restart")
         async def gps_restart():
             cfg = config.load()
-            srv = _replace_server(cfg["server_port"], cfg["server_protocol"])
+            srv = await asyncio.to_thread(
+                _replace_server, cfg["server_port"], cfg["server_protocol"])
             err = srv.start()
             return {"ok": err is None, "msg": err or "Restarted"}
 
@@ -261,21 +375,8 @@ class GPSServerPlugin(ToolkitPlugin):
             srv = _get_server()
             try:
                 with srv.lock:
-                    raw_recs = list(srv.parsed_records[:limit])
-                out = []
-                for r in raw_recs:
-                    nr = r.copy()
-                    if 'IO_Data' in r:
-                        named = {}
-                        for k, v in r['IO_Data'].items():
-                            try:
-                                kid = int(k)
-                            except (ValueError, TypeError):
-                                kid = None
-                            named[io_name(kid) if kid is not None else str(k)] = v
-                        nr['IO_Named'] = named
-                    out.append(nr)
-                return out
+                    raw_recs = srv.parsed_records[:limit]
+                return [_with_io_named(r) for r in raw_recs]
             except Exception as e:
                 print(f"  [gps] Error in /api/gps/records: {e}")
                 import traceback; traceback.print_exc()
@@ -285,18 +386,15 @@ class GPSServerPlugin(ToolkitPlugin):
         async def gps_raw(limit: int = 200, direction: str = "", search: str = "", annotate: bool = False):
             srv = _get_server()
             with srv.lock:
-                msgs = list(srv.raw_messages[:limit])
+                msgs = srv.raw_messages[:limit]
             if direction:
                 msgs = [m for m in msgs if m.get("direction", "") == direction.upper()]
             if search:
                 sq = search.upper().replace(" ", "")
                 msgs = [m for m in msgs if sq in m.get("hex", "")]
             if annotate:
-                for m in msgs:
-                    try:
-                        m["annotations"] = annotate_packet(m.get("hex", ""), m.get("protocol", "TCP"))
-                    except Exception:
-                        m["annotations"] = []
+                # Up to `limit` packet decodes – run them off the event loop
+                return await asyncio.to_thread(_annotate_all, msgs)
             return msgs
 
         @app.get("/api/gps/raw/{index}/annotate")
@@ -306,14 +404,14 @@ class GPSServerPlugin(ToolkitPlugin):
                 if index < 0 or index >= len(srv.raw_messages):
                     return {"error": "Index out of range"}
                 msg = srv.raw_messages[index]
-            annotations = annotate_packet(msg["hex"], msg.get("protocol", "TCP"))
+            annotations = await asyncio.to_thread(_annotate, msg["hex"], msg.get("protocol", "TCP"))
             return {"msg": msg, "annotations": annotations}
 
         @app.get("/api/gps/logs")
         async def gps_logs(limit: int = 200, search: str = ""):
             srv = _get_server()
             with srv.lock:
-                logs = list(srv.log_messages[:limit])
+                logs = srv.log_messages[:limit]
             if search:
                 q = search.lower()
                 logs = [l for l in logs if q in l["message"].lower() or q in l["type"].lower()]
@@ -323,7 +421,7 @@ class GPSServerPlugin(ToolkitPlugin):
         async def gps_history(limit: int = 200):
             srv = _get_server()
             with srv.lock:
-                return list(srv.command_history[:limit])
+                return srv.command_history[:limit]
 
         @app.post("/api/gps/command")
         async def gps_command(req: CommandReq):
@@ -367,6 +465,7 @@ class GPSServerPlugin(ToolkitPlugin):
         async def gps_clear():
             srv = _get_server()
             srv.clear_data()
+            _named_cache.clear()
             return {"ok": True}
 
         @app.get("/api/gps/settings")
@@ -376,6 +475,7 @@ class GPSServerPlugin(ToolkitPlugin):
                 "port": cfg.get("server_port", 7580),
                 "protocol": cfg.get("server_protocol", "TCP"),
                 "avl_ids_path": cfg.get("avl_ids_path", ""),
+                "log_max_lines": _log_max_lines(cfg),
             }
 
         @app.put("/api/gps/settings")
@@ -390,11 +490,14 @@ class GPSServerPlugin(ToolkitPlugin):
                 need_restart = True
             if req.avl_ids_path is not None:
                 updates["avl_ids_path"] = req.avl_ids_path
+            if req.log_max_lines is not None:
+                updates["log_max_lines"] = _log_max_lines({"log_max_lines": req.log_max_lines})
+                _get_server().max_log_lines = updates["log_max_lines"]   # no restart needed
             if updates:
                 config.save(updates)
                 print(f"  [gps] Settings saved: {updates}")
             if req.avl_ids_path:
-                err = refresh_io_names(req.avl_ids_path)
+                err = _reload_io_names(req.avl_ids_path)
                 if err:
                     print(f"  [gps] AVL refresh error: {err}")
                     return {"ok": False, "msg": err}
@@ -402,7 +505,8 @@ class GPSServerPlugin(ToolkitPlugin):
                     print(f"  [gps] Loaded {len(IO_ELEMENT_NAMES)} IO names")
             if need_restart:
                 cfg = config.load()
-                srv = _replace_server(cfg["server_port"], cfg["server_protocol"])
+                srv = await asyncio.to_thread(
+                    _replace_server, cfg["server_port"], cfg["server_protocol"])
                 err = srv.start()
                 return {"ok": err is None, "msg": err or "Settings applied & server restarted"}
             return {"ok": True, "msg": "Settings saved"}
@@ -419,7 +523,7 @@ class GPSServerPlugin(ToolkitPlugin):
             if not path:
                 return {"ok": False, "msg": "No AVL IDs path configured in settings"}
             print(f"  [gps] Refreshing IO names from: {path}")
-            err = refresh_io_names(path)
+            err = await asyncio.to_thread(_reload_io_names, path)
             if err:
                 print(f"  [gps] AVL refresh error: {err}")
                 return {"ok": False, "msg": err}
@@ -432,18 +536,10 @@ class GPSServerPlugin(ToolkitPlugin):
             """Export all records as JSON file download."""
             srv = _get_server()
             with srv.lock:
-                recs = list(srv.parsed_records)
-            for r in recs:
-                if 'IO_Data' in r:
-                    named = {}
-                    for k, v in r['IO_Data'].items():
-                        try:
-                            kid = int(k)
-                        except (ValueError, TypeError):
-                            kid = None
-                        named[io_name(kid) if kid is not None else str(k)] = v
-                    r['IO_Named'] = named
-            content = json.dumps(recs, indent=2, default=str)
+                recs = srv.parsed_records[:]
+            # Up to 2000 records pretty-printed – keep it off the event loop
+            content = await asyncio.to_thread(
+                lambda: _dumps([_with_io_named(r) for r in recs], pretty=True))
             return Response(
                 content=content,
                 media_type="application/json",
@@ -458,7 +554,9 @@ class GPSServerPlugin(ToolkitPlugin):
                 count = len(srv.parsed_records)
                 srv.parsed_records.clear()
                 srv._data_version += 1
-            srv.save_state()
+                srv.data_event.set()
+            _named_cache.clear()
+            srv.request_save()
             print(f"  [gps] Cleared {count} records")
             return {"ok": True, "msg": f"Cleared {count} records"}
 
@@ -477,7 +575,7 @@ class GPSServerPlugin(ToolkitPlugin):
             # Send initial state
             srv = _get_server()
             try:
-                await websocket.send_text(json.dumps(_build_status(srv), default=str))
+                await websocket.send_text(_dumps(_build_status(srv)))
             except Exception:
                 pass
             try:
@@ -8,38 +8,55 @@ from __future__ import annotations
 import os
 import re
 import sys
+import threading
 import time as _time
 from datetime import datetime, date, timedelta
-from typing import Optional, List
+from typing import TYPE_CHECKING, Optional, List
 
 import requests as _req
 from requests.auth import HTTPBasicAuth
-from jira import JIRA, JIRAError
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 
 from app.plugins.base import ToolkitPlugin
 from app import config
 
+if TYPE_CHECKING:
+    from jira import JIRA
+
 ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 DOMAIN = "teltonika-telematics.atlassian.net"
 SERVER = f"https://{DOMAIN}"
 
 _jira_client: JIRA | None = None
+# Config-derived values used on every REST call / cache hit; dropped with the client
+_basic_auth: HTTPBasicAuth | None = None
+_ttl_seconds: int | None = None
 
 
 def _jira() -> JIRA:
     global _jira_client
     if _jira_client is None:
+        # The jira package drags in a large dependency tree – import it on
+        # first use, not at app startup.
+        import jira
         c = config.load_jira_config()
-        _jira_client = JIRA(server=SERVER,
-                            basic_auth=(c.get("email", ""), c.get("token", "")))
+        _jira_client = jira.JIRA(server=SERVER,
+                                 basic_auth=(c.get("email", ""), c.get("token", "")))
     return _jira_client
 
 
+def _jira_error() -> type[Exception]:
+    """``jira.exceptions.JIRAError``, imported on demand like the client."""
+    from jira.exceptions import JIRAError
+    return JIRAError
+
+
 def _reset_jira_client():
-    global _jira_client
+    global _jira_client, _basic_auth, _ttl_seconds
     _jira_client = None
+    _basic_auth = None
+    _ttl_seconds = None
 
 # ── In-memory cache ─────────────────────────────────────────────
 # key → { "data": ..., "ts": epoch }
@@ -48,8 +65,11 @@ _wl_cache: dict[str, dict] = {}
 
 def _cache_ttl() -> int:
     """Return cache TTL in seconds from config (default 5 min)."""
-    c = config.load_jira_config()
-    return int(c.get("cache_ttl_minutes", 5)) * 60
+    global _ttl_seconds
+    if _ttl_seconds is None:
+        c = config.load_jira_config()
+        _ttl_seconds = int(c.get("cache_ttl_minutes", 5)) * 60
+    return _ttl_seconds
 
 
 def _cache_key(account_id: str, d_from: str, d_to: str) -> str:
@@ -80,17 +100,31 @@ def _cache_clear(account_id: str = None):
 
 
 def _auth():
-    c = config.load_jira_config()
-    return HTTPBasicAuth(c.get("email", ""), c.get("token", ""))
+    global _basic_auth
+    if _basic_auth is None:
+        c = config.load_jira_config()
+        _basic_auth = HTTPBasicAuth(c.get("email", ""), c.get("token", ""))
+    return _basic_auth
+
+
+_HDR = {"Accept": "application/json", "Content-Type": "application/json"}
+
+
+# One keep-alive session per thread – requests.Session is not thread-safe,
+# and a fresh TLS handshake per worklog call dominated the weekly fetch.
+_local = threading.local()
 
 
-def _headers():
-    return {"Accept": "application/json", "Content-Type": "application/json"}
+def _session() -> _req.Session:
+    s = getattr(_local, "session", None)
+    if s is None:
+        s = _local.session = _req.Session()
+    return s
 
 
 def _api(method, path, **kw):
     url = f"https://{DOMAIN}/rest/api/3/{path}"
-    return getattr(_req, method)(url, headers=_headers(), auth=_auth(), **kw)
+    return _session().request(method.upper(), url, headers=_HDR, auth=_auth(), **kw)
 
 
 # ── Models ──────────────────────────────────────────────────────────
@@ -210,7 +244,7 @@ def _fetch_worklogs_for_user(account_id: str, date_from: str, date_to: str,
            f"ORDER BY updated DESC")
     try:
         raw_issues = _jira().search_issues(jql, maxResults=50, fields="summary")
-    except JIRAError as e:
+    except _jira_error() as e:
         print(f"[Jira] search failed ({e.status_code}): {e.text[:200]}")
         return [], False
 
@@ -353,7 +387,7 @@ class JiraTrackerPlugin(ToolkitPlugin):
                 raw = _jira().search_issues(
                     jql, maxResults=50,
                     fields="summary,status,priority,attachment")
-            except JIRAError as e:
+            except _jira_error() as e:
                 raise HTTPException(e.status_code or 500, str(e))
             issues = []
             for i in raw:
@@ -644,7 +678,7 @@ class JiraTrackerPlugin(ToolkitPlugin):
                     fp = os.path.join(dest, fname)
                     if os.path.exists(fp):
                         continue
-                    fr = _req.get(url, auth=_auth(), stream=True)
+                    fr = _session().get(url, auth=_auth(), stream=True)
                     if fr.status_code == 200:
                         with open(fp, "wb") as f:
                             for chunk in fr.iter_content(8192):
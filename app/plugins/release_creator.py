@@ -9,17 +9,20 @@ from __future__ import annotations
 
 import re
 import os
-from typing import Optional
+import threading
+from typing import TYPE_CHECKING, Optional
 
 import requests as _requests
 from requests.auth import HTTPBasicAuth
-from jira import JIRA, JIRAError
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 
 from app.plugins.base import ToolkitPlugin
 from app import config
 
+if TYPE_CHECKING:
+    from jira import JIRA
+
 DOMAIN = "teltonika-telematics.atlassian.net"
 SERVER = f"https://{DOMAIN}"
 PROJECT_KEY = "FMBP"
@@ -53,12 +56,20 @@ def _jira() -> JIRA:
     """Lazy-init a JIRA client from saved config."""
     global _jira_client
     if _jira_client is None:
+        # Deferred import, same reasoning as jira_tracker._jira()
+        import jira
         c = config.load_jira_config()
-        _jira_client = JIRA(server=SERVER,
-                            basic_auth=(c.get("email", ""), c.get("token", "")))
+        _jira_client = jira.JIRA(server=SERVER,
+                                 basic_auth=(c.get("email", ""), c.get("token", "")))
     return _jira_client
 
 
+def _jira_error() -> type[Exception]:
+    """Deferred like _jira(); see jira_tracker._jira_error()."""
+    from jira.exceptions import JIRAError
+    return JIRAError
+
+
 def _raw_auth():
     """HTTPBasicAuth for raw requests calls."""
     c = config.load_jira_config()
@@ -67,15 +78,25 @@ def _raw_auth():
 
 _HDR = {"Accept": "application/json", "Content-Type": "application/json"}
 
+_local = threading.local()
+
+
+def _session() -> _requests.Session:
+    """Per-thread keep-alive session for raw REST calls."""
+    s = getattr(_local, "session", None)
+    if s is None:
+        s = _local.session = _requests.Session()
+    return s
+
 
 def _raw_get(path, **kw):
-    return _requests.get(f"{SERVER}/rest/api/2/{path}",
-                         headers=_HDR, auth=_raw_auth(), **kw)
+    return _session().get(f"{SERVER}/rest/api/2/{path}",
+                          headers=_HDR, auth=_raw_auth(), **kw)
 
 
 def _raw_post(path, body):
-    return _requests.post(f"{SERVER}/rest/api/2/{path}",
-                          headers=_HDR, auth=_raw_auth(), json=body)
+    return _session().post(f"{SERVER}/rest/api/2/{path}",
+                           headers=_HDR, auth=_raw_auth(), json=body)
 
 
 def _reset_client():
@@ -260,7 +281,7 @@ class ReleaseCreatorPlugin(ToolkitPlugin):
         async def rel_issue(key: str):
             try:
                 issue = _jira().issue(key, fields="summary")
-            except JIRAError as e:
+            except _jira_error() as e:
                 raise HTTPException(e.status_code or 400, str(e))
             return {"key": issue.key, "summary": issue.fields.summary}
 
@@ -268,7 +289,7 @@ class ReleaseCreatorPlugin(ToolkitPlugin):
         async def rel_versions(base: str = ""):
             try:
                 vs = _versions_dicts()
-            except JIRAError as e:
+            except _jira_error() as e:
                 raise HTTPException(e.status_code or 500, str(e))
             if base:
                 vs = [v for v in vs if base in v.get("name", "")]
@@ -281,7 +302,7 @@ class ReleaseCreatorPlugin(ToolkitPlugin):
             try:
                 results = _jira().search_issues(jql, maxResults=1,
                                                  fields="summary,description,fixVersions")
-            except JIRAError as e:
+            except _jira_error() as e:
                 raise HTTPException(e.status_code or 500, str(e))
             if not results:
                 return {"found": False}
@@ -297,7 +318,7 @@ class ReleaseCreatorPlugin(ToolkitPlugin):
         async def rel_free_slots(base: str):
             try:
                 vs = _versions_dicts()
-            except JIRAError as e:
+            except _jira_error() as e:
                 raise HTTPException(e.status_code or 500, str(e))
             return {
                 "free_slots": _all_free_slots(vs, base),
@@ -315,7 +336,7 @@ class ReleaseCreatorPlugin(ToolkitPlugin):
                     startDate=req.start_date,
                     releaseDate=req.release_date,
                 )
-            except JIRAError as e:
+            except _jira_error() as e:
                 raise HTTPException(e.status_code or 400, str(e))
             return {"ok": True, "version": _ver_dict(v)}
 
@@ -349,7 +370,7 @@ class ReleaseCreatorPlugin(ToolkitPlugin):
             # Fetch clone source
             try:
                 src = j.issue(req.clone_from)
-            except JIRAError as e:
+            except _jira_error() as e:
                 raise HTTPException(400, f"Cannot fetch clone source {req.clone_from}: {e}")
             clone_fields = src.raw["fields"]
 
@@ -399,7 +420,7 @@ class ReleaseCreatorPlugin(ToolkitPlugin):
             if req.prev_ticket_key and new_key:
                 try:
                     j.create_issue_link(LINK_TYPE_NAME, new_key, req.prev_ticket_key)
-                except JIRAError:
+                except _jira_error():
                     pass  # non-fatal
 
             return {"ok": True, "key": new_key, "summary": summary}
@@ -408,7 +429,7 @@ class ReleaseCreatorPlugin(ToolkitPlugin):
         async def rel_myself():
             try:
                 return _jira().myself()
-            except JIRAError as e:
+            except _jira_error() as e:
                 raise HTTPException(e.status_code or 500, str(e))
 
 
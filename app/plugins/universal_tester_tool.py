@@ -13,6 +13,7 @@ import sys
 import threading
 import time
 import uuid
+from collections import deque
 from datetime import datetime
 from typing import Optional
 
@@ -32,6 +33,10 @@ GENERATED_DIR = os.path.join(ROOT, "universal-tester-tool", "generated")
 os.makedirs(CASES_DIR, exist_ok=True)
 os.makedirs(GENERATED_DIR, exist_ok=True)
 
+# Case IDs double as file names – alphanumerics, underscore and dash only
+_CASE_ID_OK = _re.compile(r"^[a-zA-Z0-9_\-]+$")
+_CASE_ID_STRIP = _re.compile(r"[^a-zA-Z0-9_\-]")
+
 # Default path to the Universal Tester Tool engine installation
 _DEFAULT_UNIVERSAL_TESTER_TOOL_PATH = os.path.join(ROOT, "third_party", "universal-tester-tool")
 
@@ -138,6 +143,16 @@ _FUNC_PRINTS = {
     "read_catcher": "UartRead",
 }
 
+# Every function-start print the engine emits (see RunState._parse_line)
+_ALL_FUNC_NAMES = frozenset({
+    "UartWrite", "UartRead", "UartWriteRead", "Delay", "OtiiSetOut",
+    "OtiiConfig", "OtiiSet5V", "OtiiStartMeasuring", "OtiiStopMeasuring",
+    "Running func",
+})
+
+# "Function run: <func> retries: X, time: Y [<result>] [PASS]"
+_FUNC_PASS_RE = _re.compile(r'\[(.+?)\]\s*\[PASS\]')
+
 
 def _build_step_tracker(steps: list[dict]) -> list[dict]:
     """Build a list of step-progress dicts from the case steps."""
@@ -162,14 +177,59 @@ def _build_step_tracker(steps: list[dict]) -> list[dict]:
     return tracker
 
 
+# ── Test case summaries ─────────────────────────────────────────────
+
+# file name → (mtime_ns, summary).  save_case fills this from the data it just
+# wrote; listing only re-reads files whose mtime moved (edited outside the UI).
+_case_summaries: dict[str, tuple[int, dict]] = {}
+
+
+def _case_summary(data: dict, fname: str) -> dict:
+    return {
+        "id": data.get("id", fname[:-5]),
+        "name": data.get("name", fname[:-5]),
+        "device_name": data.get("device_name", ""),
+        "steps_count": len(data.get("steps", [])),
+        "iterations": data.get("iterations", 1),
+    }
+
+
+def _list_case_summaries() -> list[dict]:
+    fresh = {}
+    for entry in sorted(os.scandir(CASES_DIR), key=lambda e: e.name):
+        if not entry.name.endswith(".json"):
+            continue
+        try:
+            mtime = entry.stat().st_mtime_ns
+            cached = _case_summaries.get(entry.name)
+            if cached and cached[0] == mtime:
+                fresh[entry.name] = cached
+                continue
+            with open(entry.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            fresh[entry.name] = (mtime, _case_summary(data, entry.name))
+        except Exception:
+            pass
+    _case_summaries.clear()
+    _case_summaries.update(fresh)
+    return [summary for _, summary in fresh.values()]
+
+
 # ── Active run state ────────────────────────────────────────────────
 
+# In-memory log retention.  The live log file holds every line; once the
+# list passes the high-water mark the oldest lines are dropped in one slice.
+_LOG_KEEP_LINES = 20000
+_LOG_TRIM_AT = _LOG_KEEP_LINES + _LOG_KEEP_LINES // 4
+
+
 class RunState:
     def __init__(self):
         self.running = False
         self.run_id: str = ""
         self.process: Optional[subprocess.Popen] = None
         self.log_lines: list[str] = []
+        self.log_dropped = 0             # lines trimmed off the front of log_lines
         self.current_iteration = 0
         self.total_iterations = 1
         self.status = "idle"  # idle | running | completed | failed | stopped
@@ -186,18 +246,24 @@ class RunState:
         self.utt_root: str = ""          
         self.run_logs_dir: str = ""      
         self.log_file_handle = None
+        self._last_flush = 0.0
+        self._flush_timer: Optional[threading.Timer] = None
         self.history: list[dict] = []
         
-    def init_log_file(self):
+    def init_log_file(self, cfg: dict | None = None):
         """Open a log file handle for real-time streaming."""
-        cfg = config.load()
+        if cfg is None:
+            cfg = config.load()
         log_dir = cfg.get("universal_tester_tool_log_dir", os.path.join(ROOT, "output", "universal_tester_tool_logs"))
         os.makedirs(log_dir, exist_ok=True)
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
         case_slug = self.case_name.replace(" ", "_")[:30] if self.case_name else "unknown"
         self.log_file = os.path.join(log_dir, f"{ts}_{case_slug}.log")
         try:
-            self.log_file_handle = open(self.log_file, "w", encoding="utf-8")
+            # 64 KB buffer: append_logs() writes per burst and flushes at most
+            # once a second, so the default 8 KB would still spill mid-burst
+            self.log_file_handle = open(self.log_file, "w", encoding="utf-8",
+                                        buffering=1 << 16)
             self.append_log(f"[LOG] Streaming live logs to {self.log_file}")
         except Exception as e:
             self.append_log(f"[LOG] Failed to open live log file: {e}")
@@ -205,6 +271,9 @@ class RunState:
 
     def close_log_file(self):
         with self._lock:
+            if self._flush_timer:
+                self._flush_timer.cancel()
+                self._flush_timer = None
             if self.log_file_handle:
                 self.log_file_handle.close()
                 self.log_file_handle = None
@@ -229,16 +298,44 @@ class RunState:
             }
 
     def append_log(self, line: str):
+        self.append_logs((line,))
+
+    def append_logs(self, lines):
+        """Append several lines under one lock hold and one file write."""
+        with self._lock:
+            self.log_lines.extend(lines)
+            if len(self.log_lines) > _LOG_TRIM_AT:
+                drop = len(self.log_lines) - _LOG_KEEP_LINES
+                del self.log_lines[:drop]
+                self.log_dropped += drop
+            # Write to disk in real-time (flushed at most once per second;
+            # a timer flushes whatever a quiet spell leaves in the buffer)
+            if self.log_file_handle:
+                try:
+                    self.log_file_handle.write("\n".join(lines) + "\n")
+                    now = time.monotonic()
+                    if now - self._last_flush >= 1.0:
+                        self.log_file_handle.flush()
+                        self._last_flush = now
+                    elif self._flush_timer is None:
+                        self._flush_timer = threading.Timer(1.0, self._flush_log_file)
+                        self._flush_timer.daemon = True
+                        self._flush_timer.start()
+                except Exception:
+                    pass
+            for line in lines:
+                self._parse_line(line)
+
+    def _flush_log_file(self):
+        """Trailing flush for lines written since the last one."""
         with self._lock:
-            self.log_lines.append(line)
-            # Write to disk in real-time
+            self._flush_timer = None
             if self.log_file_handle:
                 try:
-                    self.log_file_handle.write(line + "\n")
                     self.log_file_handle.flush()
+                    self._last_flush = time.monotonic()
                 except Exception:
                     pass
-            self._parse_line(line)
 
     def _parse_line(self, line: str):
         """Detect step transitions and results from subprocess stdout."""
@@ -249,9 +346,6 @@ class RunState:
         # Detect function start prints: "UartWrite", "UartRead", "UartWriteRead", "Delay"
         # Note: UartWriteRead internally prints UartWrite + UartRead as sub-calls.
         # Only advance the cursor on the TOP-LEVEL function that matches the expected step.
-        _ALL_FUNC_NAMES = {"UartWrite", "UartRead", "UartWriteRead", "Delay", "OtiiSetOut",
-                           "OtiiConfig", "OtiiSet5V", "OtiiStartMeasuring", "OtiiStopMeasuring",
-                           "Running func"}
         if stripped in _ALL_FUNC_NAMES:
             if stripped == "Running func":
                 return  # skip this noise line
@@ -292,8 +386,7 @@ class RunState:
             if "[PASS]" in stripped:
                 step["status"] = "passed"
                 # Extract the result portion
-                import re as _re
-                m = _re.search(r'\[(.+?)\]\s*\[PASS\]', stripped)
+                m = _FUNC_PASS_RE.search(stripped)
                 if m:
                     step["result"] = m.group(1)
             elif "Timeout" in stripped or "Warning" in stripped or "Error" in stripped:
@@ -336,6 +429,7 @@ class RunState:
             self.running = False
             self.process = None
             self.log_lines = []
+            self.log_dropped = 0
             self.current_iteration = 0
             self.total_iterations = 1
             self.status = "idle"
@@ -444,16 +538,39 @@ def _get_protected_pids() -> set[str]:
     return protected
 
 
+_PYTHON_EXES = {"python.exe", "python3.exe", "pythonw.exe"}
+_UTT_LAUNCHER_RE = _re.compile(
+    r'launcher\.py.*universal-tester-tool|universal-tester-tool.*launcher\.py', _re.I)
+
+
 def _nuke_all_universal_tester_tool_processes():
     """Kill every Python process whose command-line references the UTT launcher.
 
-    Uses PowerShell's Get-CimInstance (reliable, unlike deprecated wmic) to find
+    Walks the process table in-process with psutil when available; otherwise
+    uses PowerShell's Get-CimInstance (reliable, unlike deprecated wmic) to find
     orphaned processes, then taskkill /F each one.  Carefully excludes the
     server process and all its ancestors so the toolkit stays alive.
     """
     if os.name != "nt":
         return
     protected = _get_protected_pids()
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    if psutil is not None:
+        # Direct process-table query – no PowerShell start-up per cleanup
+        for p in psutil.process_iter(["pid", "name", "cmdline"]):
+            try:
+                if (p.info["name"] or "").lower() not in _PYTHON_EXES:
+                    continue
+                if str(p.info["pid"]) in protected:
+                    continue
+                if _UTT_LAUNCHER_RE.search(" ".join(p.info["cmdline"] or [])):
+                    p.kill()
+            except Exception:
+                pass
+        return
     try:
         # Only match processes that are clearly UTT launcher invocations
         ps_cmd = (
@@ -481,6 +598,8 @@ def _nuke_all_universal_tester_tool_processes():
 
 # Regex metacharacters that need escaping so UTT compiles them as literals.
 _REGEX_META = _re.compile(r'(%\w+%)|([\[\](){}.*+?^$|\\])')
+# %var% capture placeholders in an expected-output pattern
+_VAR_PLACEHOLDER = _re.compile(r'%\w+%')
 
 
 def _format_output_for_yaml(output: str, match_type: str = "loose") -> str:
@@ -609,8 +728,7 @@ def _step_to_yaml_func(step: dict) -> str:
         ]
         args = step.get("args", [])
         if not args:
-            import re as _re
-            n_vars = len(_re.findall(r'%\w+%', output))
+            n_vars = len(_VAR_PLACEHOLDER.findall(output))
             args = ["NaN"] * max(n_vars, 1)
         lines.append('    args:')
         for a in args:
@@ -633,8 +751,7 @@ def _step_to_yaml_func(step: dict) -> str:
         args = step.get("args", [])
         if not args:
             # Count %var% placeholders in output; if none, still need one arg
-            import re as _re
-            n_vars = len(_re.findall(r'%\w+%', output))
+            n_vars = len(_VAR_PLACEHOLDER.findall(output))
             args = ["NaN"] * max(n_vars, 1)
         lines.append('    args:')
         for a in args:
@@ -717,15 +834,16 @@ def _generate_test_main_yaml(case: dict, test_file_rel: str) -> str:
     return "\n".join(lines) + "\n"
 
 
-def _prepare_run_directory(case: dict) -> dict:
+def _prepare_run_directory(case: dict, utt_root: str | None = None) -> dict:
     """Generate all YAML files for a test case and return paths."""
     case_id = case.get("id", str(uuid.uuid4())[:8])
     run_dir = os.path.join(GENERATED_DIR, case_id)
     os.makedirs(run_dir, exist_ok=True)
 
-    utt_root = _resolve_utt_root(
-        config.load().get("universal_tester_tool_path", _DEFAULT_UNIVERSAL_TESTER_TOOL_PATH)
-    )
+    if utt_root is None:
+        utt_root = _resolve_utt_root(
+            config.load().get("universal_tester_tool_path", _DEFAULT_UNIVERSAL_TESTER_TOOL_PATH)
+        )
 
     # Test steps YAML
     test_yaml = _generate_test_yaml(case.get("steps", []))
@@ -845,16 +963,24 @@ def _run_test_thread(case: dict, paths: dict, my_run_id: str):
 
             # Non-blocking readline via a reader thread so we can
             # detect hangs and honour stop requests without blocking.
-            import queue as _queue
-            _line_q: _queue.Queue = _queue.Queue()
+            # Lines go into a plain deque (append/popleft need no lock); the
+            # event only wakes the loop below when it is idle, so a burst of
+            # output costs one wake-up instead of a Queue lock per line.
+            _lines: deque = deque()
+            _more = threading.Event()
+
+            def _push(ln):
+                _lines.append(ln)
+                if not _more.is_set():
+                    _more.set()
 
             def _reader():
                 try:
                     for ln in iter(proc.stdout.readline, ""):
-                        _line_q.put(ln)
+                        _push(ln)
                 except Exception:
                     pass
-                _line_q.put(None)  # sentinel
+                _push(None)  # sentinel
 
             _reader_t = threading.Thread(target=_reader, daemon=True)
             _reader_t.start()
@@ -873,37 +999,56 @@ def _run_test_thread(case: dict, paths: dict, my_run_id: str):
                     _nuke_all_universal_tester_tool_processes()
                     break
 
-                try:
-                    line = _line_q.get(timeout=1)
-                except _queue.Empty:
+                if not _lines:
+                    _more.clear()
+                    # Re-check after clearing: a line pushed in between saw
+                    # the event still set and did not set it again
+                    if not _lines:
+                        _more.wait(timeout=1)
+                if not _lines:
                     # No output for 1s — check if process died naturally
                     if proc.poll() is not None:
                         break
                     continue
-                    
-                if line is None:
-                    break  # pipe closed
-                
+
+                # Take everything queued so far: a chatty test then costs one
+                # lock hold and one file write per burst, not per line
+                chunk = []
+                while _lines and len(chunk) < 500:
+                    chunk.append(_lines.popleft())
+                eof = chunk[-1] is None
+                if eof:
+                    chunk.pop()
+
                 _no_output_since = time.time()
-                stripped = line.rstrip()
-                if stripped:
-                    _run.append_log(stripped)
-
-                    # Fail fast on busy/unavailable COM ports with actionable guidance.
-                    if "Failed to open COM" in stripped or "could not open port" in stripped:
-                        _run.append_log("[ACTION] COM port is busy or locked by another tool.")
-                        _run.append_log("[ACTION] Close any program using the port (e.g. PuTTY, Catcher, another terminal), then press NUKE RESET and retry.")
-                        if _run.run_id == my_run_id:
-                            with _run._lock:
-                                for s in _run.steps:
-                                    if s["status"] == "running":
-                                        s["status"] = "failed"
-                                        s["result"] = "COM port busy"
-                                _run.status = "failed"
-                                _run.fail_reason = "com_port"
-                                _run.running = False
-                        _force_kill_process_tree(proc)
-                        return
+                batch = [ln for ln in (c.rstrip() for c in chunk) if ln]
+                # Fail fast on busy/unavailable COM ports with actionable guidance:
+                # log up to the failing line only, so the guidance follows it
+                port_fail = next((i for i, ln in enumerate(batch)
+                                  if "Failed to open COM" in ln or "could not open port" in ln),
+                                 None)
+                if port_fail is not None:
+                    del batch[port_fail + 1:]
+                if batch:
+                    _run.append_logs(batch)
+
+                if port_fail is not None:
+                    _run.append_log("[ACTION] COM port is busy or locked by another tool.")
+                    _run.append_log("[ACTION] Close any program using the port (e.g. PuTTY, Catcher, another terminal), then press NUKE RESET and retry.")
+                    if _run.run_id == my_run_id:
+                        with _run._lock:
+                            for s in _run.steps:
+                                if s["status"] == "running":
+                                    s["status"] = "failed"
+                                    s["result"] = "COM port busy"
+                            _run.status = "failed"
+                            _run.fail_reason = "com_port"
+                            _run.running = False
+                    _force_kill_process_tree(proc)
+                    return
+
+                if eof:
+                    break  # pipe closed
 
             # Clean up process
             try:
@@ -1012,6 +1157,10 @@ def _save_log_file():
     """Write all captured log lines to a timestamped file."""
     if not _run.log_lines:
         return
+    if _run.log_dropped and _run.log_file and os.path.isfile(_run.log_file):
+        # The head of the log was trimmed from memory; the live stream has it all
+        _run.append_log(f"[LOG] Full log in {_run.log_file}")
+        return
     cfg = config.load()
     log_dir = cfg.get("universal_tester_tool_log_dir", os.path.join(ROOT, "output", "universal_tester_tool_logs"))
     os.makedirs(log_dir, exist_ok=True)
@@ -1020,8 +1169,13 @@ def _save_log_file():
     fname = f"{ts}_{case_slug}.log"
     fpath = os.path.join(log_dir, fname)
     try:
-        with open(fpath, "w", encoding="utf-8") as f:
-            f.write("\n".join(_run.log_lines))
+        # Stream through a 64 KB buffer rather than joining the whole log into one str
+        with open(fpath, "w", encoding="utf-8", buffering=1 << 16) as f:
+            lines = iter(list(_run.log_lines))
+            f.write(next(lines))
+            for line in lines:
+                f.write("\n")
+                f.write(line)
         _run.log_file = fpath
         _run.append_log(f"[LOG] Saved to {fpath}")
     except Exception as e:
@@ -1092,23 +1246,7 @@ class UniversalTesterToolPlugin(ToolkitPlugin):
 
         @app.get("/api/universal_tester_tool/cases")
         async def list_cases():
-            cases = []
-            for fname in sorted(os.listdir(CASES_DIR)):
-                if fname.endswith(".json"):
-                    fpath = os.path.join(CASES_DIR, fname)
-                    try:
-                        with open(fpath, "r", encoding="utf-8") as f:
-                            data = json.load(f)
-                        cases.append({
-                            "id": data.get("id", fname[:-5]),
-                            "name": data.get("name", fname[:-5]),
-                            "device_name": data.get("device_name", ""),
-                            "steps_count": len(data.get("steps", [])),
-                            "iterations": data.get("iterations", 1),
-                        })
-                    except Exception:
-                        pass
-            return cases
+            return _list_case_summaries()
 
         @app.get("/api/universal_tester_tool/cases/{case_id}")
         async def get_case(case_id: str):
@@ -1123,28 +1261,29 @@ class UniversalTesterToolPlugin(ToolkitPlugin):
         async def save_case(body: TestCaseIn):
             case_id = body.name.replace(" ", "_").lower()[:40]
             # Sanitize case_id: only allow alphanumeric, underscore, dash
-            import re
-            case_id = re.sub(r"[^a-zA-Z0-9_\-]", "", case_id)
+            case_id = _CASE_ID_STRIP.sub("", case_id)
             if not case_id:
                 case_id = str(uuid.uuid4())[:8]
             data = body.dict()
             data["id"] = case_id
             data["updated_at"] = datetime.now().isoformat()
-            fpath = os.path.join(CASES_DIR, f"{case_id}.json")
+            fname = f"{case_id}.json"
+            fpath = os.path.join(CASES_DIR, fname)
             with open(fpath, "w", encoding="utf-8") as f:
                 json.dump(data, f, indent=2)
+            _case_summaries[fname] = (os.stat(fpath).st_mtime_ns, _case_summary(data, fname))
             # Return the full saved case so the frontend can sync
             return data
 
         @app.delete("/api/universal_tester_tool/cases/{case_id}")
         async def delete_case(case_id: str):
-            import re
-            if not re.match(r"^[a-zA-Z0-9_\-]+$", case_id):
+            if not _CASE_ID_OK.match(case_id):
                 from fastapi import HTTPException
                 raise HTTPException(400, "Invalid case ID")
             fpath = os.path.join(CASES_DIR, f"{case_id}.json")
             if os.path.exists(fpath):
                 os.remove(fpath)
+                _case_summaries.pop(f"{case_id}.json", None)
                 return {"status": "deleted"}
             from fastapi import HTTPException
             raise HTTPException(404, "Test case not found")
@@ -1171,8 +1310,7 @@ class UniversalTesterToolPlugin(ToolkitPlugin):
                 from fastapi import HTTPException
                 raise HTTPException(409, "A test is already running")
 
-            import re
-            if not re.match(r"^[a-zA-Z0-9_\-]+$", case_id):
+            if not _CASE_ID_OK.match(case_id):
                 from fastapi import HTTPException
                 raise HTTPException(400, "Invalid case ID")
 
@@ -1184,14 +1322,17 @@ class UniversalTesterToolPlugin(ToolkitPlugin):
             with open(fpath, "r", encoding="utf-8") as f:
                 case = json.load(f)
 
+            # One settings read for the whole start: the UTT root and the log
+            # directory below both come from this snapshot
+            cfg = config.load()
             utt_root = _resolve_utt_root(
-                config.load().get("universal_tester_tool_path", _DEFAULT_UNIVERSAL_TESTER_TOOL_PATH)
+                cfg.get("universal_tester_tool_path", _DEFAULT_UNIVERSAL_TESTER_TOOL_PATH)
             )
             if not os.path.isdir(utt_root):
                 from fastapi import HTTPException
                 raise HTTPException(400, f"Universal Tester Tool path not found: {utt_root}")
 
-            paths = _prepare_run_directory(case)
+            paths = _prepare_run_directory(case, utt_root)
 
             _run.reset()
             _run.running = True
@@ -1203,7 +1344,7 @@ class UniversalTesterToolPlugin(ToolkitPlugin):
             _run.device_name = case.get("device_name", "")
             _run.utt_root = utt_root
             _run.run_logs_dir = ""
-            _run.init_log_file()
+            _run.init_log_file(cfg)
             run_id = _run.run_id
             thread = threading.Thread(target=_run_test_thread, args=(case, paths, run_id), daemon=True)
             thread.start()
@@ -1282,7 +1423,8 @@ class UniversalTesterToolPlugin(ToolkitPlugin):
         async def list_ports():
             try:
                 import serial.tools.list_ports
-                ports = serial.tools.list_ports.comports()
+                # Enumeration can take a second on Windows – off the event loop
+                ports = await asyncio.to_thread(serial.tools.list_ports.comports)
                 return sorted(
                     [{"port": p.device, "desc": p.description}
                      for p in ports],
@@ -1299,19 +1441,22 @@ class UniversalTesterToolPlugin(ToolkitPlugin):
             _ws_clients.add(ws)
             # Start from current length so the HTTP status fetch (log_tail)
             # handles initial log population without the WS duplicating it.
-            last_len = len(_run.log_lines)
+            # Positions are absolute (trimmed + retained) so they survive trimming.
+            last_len = _run.log_dropped + len(_run.log_lines)
             try:
                 while True:
                     await asyncio.sleep(1)
                     state = _run.to_dict()
                     logs = state.pop("log_tail", [])
                     # Only send new lines
-                    if len(_run.log_lines) > last_len:
-                        new_lines = _run.log_lines[last_len:]
-                        last_len = len(_run.log_lines)
-                        state["new_lines"] = new_lines
-                    else:
-                        state["new_lines"] = []
+                    with _run._lock:
+                        total = _run.log_dropped + len(_run.log_lines)
+                        if total > last_len:
+                            start = max(last_len - _run.log_dropped, 0)
+                            state["new_lines"] = _run.log_lines[start:]
+                            last_len = total
+                        else:
+                            state["new_lines"] = []
                     await ws.send_json(state)
             except (WebSocketDisconnect, Exception):
                 pass
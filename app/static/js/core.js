@@ -351,11 +351,8 @@ export function renderHex(container, hexStr, annotations) {
   const hex = hexStr.replace(/\s/g, "");
   const sorted = [...annotations].sort((a, b) => a.start - b.start);
   let pos = 0;
-  const fmtRange = (s, e) => {
-    let r = "";
-    for (let i = s; i < e && i * 2 < hex.length; i++) r += hex.substr(i * 2, 2) + " ";
-    return r;
-  };
+  // One slice + one native replace per range instead of a string append per byte
+  const fmtRange = (s, e) => hex.slice(s * 2, Math.ceil(e) * 2).replace(/../g, "$& ");
   for (let i = 0; i < sorted.length; i++) {
     const ann = sorted[i], color = ann.color || colors[i % colors.length];
     if (ann.start > pos) div.appendChild(document.createTextNode(fmtRange(pos, ann.start)));
@@ -5,6 +5,30 @@
    ================================================================ */
 import { h, $, $$, api, toast, registerPlugin, createTabs, createTable, renderHex, icons, makeColumnsResizable } from "./core.js";
 
+// Log type → badge class.  Types are a small fixed set, so each is resolved once.
+const LOG_TYPE_BADGES = {
+  STOP: "red", DISC: "red", START: "green", CONN: "green", ACK: "green",
+  DATA: "blue", IMEI: "blue", CMD: "yellow", RESP: "yellow",
+};
+const _logBadgeCache = new Map();
+
+function _logBadgeClass(tp) {
+  let cls = _logBadgeCache.get(tp);
+  if (cls === undefined) {
+    const badge = tp.includes("ERR") ? "danger"
+      : tp.includes("WARN") ? "warning"
+      : LOG_TYPE_BADGES[tp] || "primary";
+    cls = `badge badge-${badge}`;
+    _logBadgeCache.set(tp, cls);
+  }
+  return cls;
+}
+
+/** Assign textContent only when it differs – avoids needless text-node churn. */
+function _setText(el, text) {
+  if (el.textContent !== text) el.textContent = text;
+}
+
 registerPlugin({
   id: "gps", name: "GPS Server", order: 1,
   svgIcon: icons.satellite,
@@ -41,6 +65,7 @@ registerPlugin({
   },
 
   init(container) {
+    this._destroyed = false;
     this._loadIoNames();
     createTabs(container, [
       { id: "dash", label: "Dashboard", render: c => this._renderDash(c) },
@@ -54,7 +79,9 @@ registerPlugin({
   },
 
   destroy() {
+    this._destroyed = true;   // stops the onclose auto-reconnect
     if (this._ws) { this._ws.close(); this._ws = null; }
+    if (this._dashRaf) { cancelAnimationFrame(this._dashRaf); this._dashRaf = 0; }
   },
 
   async _loadIoNames() {
@@ -72,7 +99,17 @@ registerPlugin({
         const msg = JSON.parse(e.data);
         if (msg.type === "status") {
           Object.assign(this._data, msg);
-          this._updateDash();
+          // Several pushes can land between frames (reconnect bursts, a
+          // throttled background tab) – render once per frame, latest data.
+          // Only touch the DOM while the Dashboard tab is on screen – the tab
+          // body is shared, so check a node the dashboard owns (switching
+          // tabs detaches it); _renderDash() reloads status when shown again.
+          if (!this._dashRaf) {
+            this._dashRaf = requestAnimationFrame(() => {
+              this._dashRaf = 0;
+              if (this._devicesCard?.isConnected) this._updateDash();
+            });
+          }
         }
       } catch (err) { console.warn("[GPS] WS parse error:", err.message); }
     };
@@ -90,7 +127,6 @@ registerPlugin({
 
   /* ── Dashboard ────────────────────────────────────────── */
   _renderDash(c) {
-    this._dashEl = c;
     c.innerHTML = "";
 
     const metrics = h("div", { className: "metrics" });
@@ -113,6 +149,7 @@ registerPlugin({
         h("span", { className: "btn-icon", html: icons.trash }), "Clear All"),
     ));
 
+    this._devRows = new Map();   // IMEI → row elements, see _updateDash()
     this._devicesCard = h("div", { className: "card" },
       h("h3", null, "Connected Devices"),
       h("div", { id: "gps-devices-list" }, h("span", { className: "text-muted" }, "No devices")));
@@ -158,23 +195,31 @@ registerPlugin({
     if (dl) {
       const devs = d.devices || {};
       const keys = Object.keys(devs);
+      const rows = this._devRows;
       if (keys.length === 0) {
+        rows.clear();
         dl.innerHTML = '<span class="text-muted">No devices connected</span>';
       } else {
-        dl.innerHTML = "";
+        // Rows are keyed by IMEI: known devices are patched in place, only
+        // new arrivals are built (batched in one fragment) and gone ones dropped.
+        for (const [imei, row] of rows) {
+          if (!(imei in devs)) { row.el.remove(); rows.delete(imei); }
+        }
+        if (!rows.size) dl.replaceChildren();   // drop the "no devices" placeholder
+        const frag = document.createDocumentFragment();
         for (const imei of keys) {
           const dev = devs[imei];
-          dl.appendChild(h("div", {
-            style: "display:flex;justify-content:space-between;align-items:center;padding:6px 0;border-bottom:1px solid var(--tk-border)"
-          },
-            h("div", null,
-              h("strong", { style: "font-family:var(--font-mono);font-size:13px" }, imei),
-              h("span", { className: "text-muted", style: "margin-left:10px;font-size:12px" }, dev.ip || "")),
-            h("div", { style: "display:flex;gap:4px" },
-              h("span", { className: "badge badge-primary" }, dev.protocol || ""),
-              h("span", { className: "badge badge-green" }, dev.status || ""))
-          ));
+          let row = rows.get(imei);
+          if (!row) {
+            row = this._devRow(imei);
+            rows.set(imei, row);
+            frag.appendChild(row.el);
+          }
+          _setText(row.ip, dev.ip || "");
+          _setText(row.proto, dev.protocol || "");
+          _setText(row.status, dev.status || "");
         }
+        dl.appendChild(frag);
       }
     }
 
@@ -203,6 +248,16 @@ registerPlugin({
     }
   },
 
+  _devRow(imei) {
+    const ip = h("span", { className: "text-muted gps-dev-ip" });
+    const proto = h("span", { className: "badge badge-primary" });
+    const status = h("span", { className: "badge badge-green" });
+    const el = h("div", { className: "gps-dev-row" },
+      h("div", null, h("strong", { className: "gps-dev-imei" }, imei), ip),
+      h("div", { className: "gps-dev-badges" }, proto, status));
+    return { el, ip, proto, status };
+  },
+
   async _ctl(action) {
     try {
       const r = await api(`/api/gps/${action}`, { method: "POST" });
@@ -235,7 +290,7 @@ registerPlugin({
         h("span", { className: "btn-icon", html: icons.plug }), "Pin IOs"),
       h("button", { className: "btn", onclick: () => this._exportRecords("json") },
         h("span", { className: "btn-icon", html: icons.file }), "Export JSON"),
-      h("button", { className: "btn", onclick: () => this._exportRecords("csv") },
+      h("button", { className: "btn", onclick: (ev) => this._exportRecords("csv", ev.currentTarget) },
         h("span", { className: "btn-icon", html: icons.file }), "Export CSV"),
       h("button", { className: "btn btn-danger", onclick: () => this._clearRecords(c) },
         h("span", { className: "btn-icon", html: icons.trash }), "Clear"),
@@ -257,6 +312,15 @@ registerPlugin({
   async _fetchAndRenderRecords(c) {
     const area = this._recTableArea;
     if (!area) return;
+    // Repeat Refresh clicks join the fetch already running instead of
+    // queueing more 1000-record fetches + table rebuilds behind it
+    if (this._recFetch) return this._recFetch;
+    this._recFetch = this._fetchRecordsOnce(area)
+      .finally(() => { this._recFetch = null; });
+    return this._recFetch;
+  },
+
+  async _fetchRecordsOnce(area) {
     area.innerHTML = '<div class="spinner"></div>';
 
     try {
@@ -519,14 +583,25 @@ registerPlugin({
       }
     }
 
+    // Names lower-cased once per picker.  A query that extends the previous
+    // one can only match a subset of its hits, so typing narrows incrementally.
+    const lowerNames = new Map(sorted.map(id => [id, this._ioName(parseInt(id)).toLowerCase()]));
+    let lastFilter = "", lastItems = sorted;
+
+    const paintPinned = (row, pinned) => {
+      row.style.background = pinned ? "rgba(59,130,246,0.12)" : "rgba(0,0,0,0.12)";
+      row.style.border = pinned ? "1px solid rgba(59,130,246,0.3)" : "1px solid transparent";
+    };
+
     const renderList = (filter = "") => {
       listEl.innerHTML = "";
       const f = filter.toLowerCase();
-      let items = sorted.filter(id => {
-        if (!f) return true;
-        const name = this._ioName(parseInt(id));
-        return id.includes(f) || name.toLowerCase().includes(f);
-      });
+      const pool = f.startsWith(lastFilter) ? lastItems : sorted;
+      let items = f
+        ? pool.filter(id => id.includes(f) || lowerNames.get(id).includes(f))
+        : sorted.slice();
+      lastFilter = f;
+      lastItems = items;
 
       // Sort: pinned first, then those in data, then by ID
       items.sort((a, b) => {
@@ -543,17 +618,17 @@ registerPlugin({
         const freq = ioFreq[id] || 0;
         const row = h("label", {
           style: "display:flex;align-items:center;gap:8px;padding:5px 8px;cursor:pointer;" +
-                 "border-radius:4px;font-size:12px;" +
-                 (pinned ? "background:rgba(59,130,246,0.12);border:1px solid rgba(59,130,246,0.3)" :
-                           "background:rgba(0,0,0,0.12);border:1px solid transparent") +
-                 ";margin-bottom:3px"
+                 "border-radius:4px;font-size:12px;margin-bottom:3px"
         },
           h("input", {
             type: "checkbox", checked: pinned ? "checked" : undefined,
             onchange: (e) => {
               cols.ios[id] = e.target.checked;
               this._saveRecCols();
-              renderList(searchInput.value);
+              // Restyle just this row – re-rendering the whole list for one
+              // toggle rebuilt hundreds of rows (pinned-first order applies
+              // on the next filter change)
+              paintPinned(row, e.target.checked);
             }
           }),
           h("span", { style: "font-family:var(--font-mono);min-width:40px;color:var(--tk-fg-dim)" }, `[${id}]`),
@@ -562,6 +637,7 @@ registerPlugin({
             ? h("span", { className: "badge badge-green", style: "font-size:10px" }, `${freq}x`)
             : h("span", { className: "text-muted", style: "font-size:10px" }, "no data")
         );
+        paintPinned(row, pinned);
         listEl.appendChild(row);
       }
       if (!items.length) {
@@ -696,7 +772,9 @@ registerPlugin({
     document.body.appendChild(modal);
   },
 
-  async _exportRecords(fmt) {
+  async _exportRecords(fmt, btn) {
+    // The CSV path awaits a fetch – keep a second click from starting another
+    if (btn?.disabled) return;
     try {
       if (fmt === "json") {
         const link = document.createElement("a");
@@ -709,6 +787,7 @@ registerPlugin({
         return;
       }
       // CSV: fetch data, convert client-side
+      if (btn) btn.disabled = true;
       const recs = await api("/api/gps/records?limit=10000");
       if (!recs?.length) { toast("No records to export", "info"); return; }
 
@@ -728,22 +807,21 @@ registerPlugin({
       });
       const allCols = [...baseCols, ...ioCols];
 
-      let csv = allCols.join(",") + "\n";
+      const cell = v => {
+        const s = String(v);
+        return s.includes(",") || s.includes('"') ? `"${s.replace(/"/g, '""')}"` : s;
+      };
+      // One string per row handed to the Blob as parts – the file is never
+      // materialised as a single ever-growing string.
+      const parts = [allCols.join(",") + "\n"];
       for (const r of recs) {
-        const baseVals = baseCols.map(c => {
-          const v = r[c] ?? "";
-          const s = String(v);
-          return s.includes(",") || s.includes('"') ? `"${s.replace(/"/g, '""')}"` : s;
-        });
-        const ioVals = sortedIoKeys.map(k => {
-          const v = (r.IO_Data || {})[k] ?? (r.IO_Data || {})[parseInt(k)] ?? "";
-          const s = String(v);
-          return s.includes(",") || s.includes('"') ? `"${s.replace(/"/g, '""')}"` : s;
-        });
-        csv += [...baseVals, ...ioVals].join(",") + "\n";
+        const io = r.IO_Data || {};
+        const baseVals = baseCols.map(c => cell(r[c] ?? ""));
+        const ioVals = sortedIoKeys.map(k => cell(io[k] ?? io[parseInt(k)] ?? ""));
+        parts.push([...baseVals, ...ioVals].join(",") + "\n");
       }
 
-      const blob = new Blob([csv], { type: "text/csv" });
+      const blob = new Blob(parts, { type: "text/csv" });
       const link = document.createElement("a");
       link.href = URL.createObjectURL(blob);
       link.download = "gps_records.csv";
@@ -753,6 +831,7 @@ registerPlugin({
       URL.revokeObjectURL(link.href);
       toast(`Exported ${recs.length} records as CSV`, "success");
     } catch (e) { toast("Export failed: " + e.message, "error"); }
+    finally { if (btn) btn.disabled = false; }
   },
 
   async _clearRecords(c) {
@@ -798,6 +877,9 @@ registerPlugin({
   },
 
   async _loadRaw(container, annotate = false) {
+    // Only the newest request renders – a slow "Annotate All" finishing after
+    // a later filter change must not overwrite (or double-render) the view
+    const seq = this._rawSeq = (this._rawSeq || 0) + 1;
     container.innerHTML = '<div class="spinner"></div>';
     const dir = this._rawDirFilter?.value || "";
     const search = this._rawSearchInput?.value || "";
@@ -809,6 +891,7 @@ registerPlugin({
       if (annotate) url += `&annotate=true`;
 
       const raw = await api(url);
+      if (seq !== this._rawSeq) return;
       container.innerHTML = "";
 
       if (!raw?.length) {
@@ -856,7 +939,7 @@ registerPlugin({
           this._renderAnnotatedHex(card, pkt);
         } else {
           const hexDiv = h("div", { className: "hex-viewer", style: "word-break:break-all;font-size:12px" });
-          const hex = (pkt.hex || "").replace(/(.{2})/g, "$1 ").trim();
+          const hex = (pkt.hex || "").replace(/../g, "$& ").trimEnd();
           hexDiv.textContent = hex;
           card.appendChild(hexDiv);
         }
@@ -864,8 +947,10 @@ registerPlugin({
         container.appendChild(card);
       }
     } catch (e) {
+      if (seq !== this._rawSeq) return;
       console.error("[GPS] Load raw failed:", e);
-      container.innerHTML = `<div class="card card-error"><p>Failed to load raw data: ${e.message}</p></div>`;
+      container.replaceChildren(h("div", { className: "card card-error" },
+        h("p", null, `Failed to load raw data: ${e.message}`)));
     }
   },
 
@@ -1024,7 +1109,7 @@ registerPlugin({
     const searchInput = h("input", {
       className: "form-control", type: "text",
       placeholder: "Search logs...", style: "width:250px",
-      onkeydown: (e) => { if (e.key === "Enter") loadLogs(); }
+      onkeydown: (e) => { if (e.key === "Enter") showLogs(); }
     });
 
     c.appendChild(h("div", { className: "btn-group", style: "margin-bottom:12px" },
@@ -1036,38 +1121,37 @@ registerPlugin({
     const logContainer = h("div", { className: "log-container", style: "max-height:calc(100vh - 220px)" });
     c.appendChild(logContainer);
 
+    // Last fetched page plus its lower-cased search text, built once per fetch:
+    // searching filters this locally instead of re-requesting and re-lowering
+    let logs = [], hay = [];
+
+    const showLogs = () => {
+      const q = searchInput.value.toLowerCase();
+      const shown = q ? logs.filter((_, i) => hay[i].includes(q)) : logs;
+      if (!shown.length) {
+        logContainer.innerHTML = '<span class="text-muted" style="padding:8px">No logs</span>';
+        return;
+      }
+      // Build off-document, attach once – one layout pass for all lines
+      const frag = document.createDocumentFragment();
+      for (const e of shown) {
+        const tp = (e.type || "").toUpperCase();
+        frag.appendChild(h("div", { className: "log-line" },
+          h("span", { className: "text-muted gps-log-ts" }, e.timestamp || ""),
+          h("span", { className: _logBadgeClass(tp) + " gps-log-type" }, tp),
+          e.message || ""));
+      }
+      logContainer.replaceChildren(frag);
+    };
+
     const loadLogs = async () => {
       logContainer.innerHTML = '<div class="spinner"></div>';
       try {
-        const search = searchInput.value;
-        let url = "/api/gps/logs?limit=500";
-        if (search) url += `&search=${encodeURIComponent(search)}`;
-        const logs = await api(url);
-        logContainer.innerHTML = "";
-        if (!logs?.length) {
-          logContainer.innerHTML = '<span class="text-muted" style="padding:8px">No logs</span>';
-          return;
-        }
-        for (const e of logs) {
-          const tp = (e.type || "").toUpperCase();
-          let badge = "primary";
-          if (tp.includes("ERR")) badge = "danger";
-          else if (tp.includes("WARN")) badge = "warning";
-          else if (tp === "STOP" || tp === "DISC") badge = "red";
-          else if (tp === "START" || tp === "CONN" || tp === "ACK") badge = "green";
-          else if (tp === "DATA" || tp === "IMEI") badge = "blue";
-          else if (tp === "CMD" || tp === "RESP") badge = "yellow";
-          logContainer.appendChild(h("div", { className: "log-line" },
-            h("span", { className: "text-muted", style: "margin-right:8px;font-size:11px;min-width:70px;display:inline-block" },
-              e.timestamp || ""),
-            h("span", {
-              className: `badge badge-${badge}`,
-              style: "margin-right:8px;min-width:55px;text-align:center;font-size:10px"
-            }, tp),
-            e.message || ""));
-        }
+        logs = (await api("/api/gps/logs?limit=500")) || [];
+        hay = logs.map(e => `${e.message || ""}\n${e.type || ""}`.toLowerCase());
+        showLogs();
       } catch (e) {
-        logContainer.innerHTML = `<p class="text-muted">Failed to load logs: ${e.message}</p>`;
+        logContainer.replaceChildren(h("p", { className: "text-muted" }, `Failed to load logs: ${e.message}`));
       }
     };
 
@@ -1099,7 +1183,13 @@ registerPlugin({
           h("select", { id: "gps-proto", className: "form-control", style: "width:100%" },
             ["TCP", "UDP"].map(p =>
               h("option", { value: p, selected: (cfg.protocol || "TCP") === p }, p))
-          ))
+          )),
+        h("div", { className: "form-group", style: "flex:1" },
+          h("label", null, "Max log lines kept"),
+          h("input", {
+            id: "gps-log-max", className: "form-control", type: "number", min: "100",
+            value: String(cfg.log_max_lines || 1000), style: "width:100%"
+          }))
       ));
 
       form.appendChild(h("button", {
@@ -1111,7 +1201,8 @@ registerPlugin({
             if (!port || port < 1 || port > 65535) {
               toast("Invalid port number (1-65535)", "error"); return;
             }
-            const payload = { port, protocol };
+            const log_max_lines = Number($("#gps-log-max").value) || 1000;
+            const payload = { port, protocol, log_max_lines };
             console.log("[GPS] Saving settings:", payload);
             const res = await api("/api/gps/settings", {
               method: "PUT",
@@ -1200,7 +1291,8 @@ registerPlugin({
 
     } catch (e) {
       console.error("[GPS] Load settings failed:", e);
-      c.innerHTML = `<div class="card card-error"><p>Failed to load settings: ${e.message}</p></div>`;
+      c.replaceChildren(h("div", { className: "card card-error" },
+        h("p", null, `Failed to load settings: ${e.message}`)));
     }
   },
 
@@ -5,10 +5,25 @@ import { h, $, $$, api, toast, registerPlugin, icons } from "./core.js";
 
 const PLUGIN_ID = "universal_tester_tool";
 let _catalog = [];
+let _catalogByType = new Map();   // step type → catalog entry, rebuilt with _catalog
 let _cases = [];
 let _currentCase = null;
 let _ws = null;
 let _logEl = null;
+const LOG_MAX_LINES = 2000;   // run log box keeps only the newest N lines
+let _logLineCount = 0;
+const _logChunkLines = [];    // line count of each text node in the log box, oldest first
+let _hiddenStatus = null;     // newest WS status received while the page was hidden
+
+// Status → [label, badge class]; step status → icon.  Looked up per WS update.
+const STATUS_BADGES = {
+  idle: ["Idle", "idle"],
+  running: ["Running", "running"],
+  completed: ["Completed", "success"],
+  failed: ["Failed", "error"],
+  stopped: ["Stopped", "warn"],
+};
+const STEP_ICONS = { pending: "○", running: "◉", passed: "✓", failed: "✗" };
 
 // ── Background WebSocket for global notifications ──────────
 let _bgWs = null;
@@ -77,6 +92,11 @@ _bgWsTimer = setInterval(_connectBackgroundWS, 3000);
 
 // ── Helpers ────────────────────────────────────────────────────────
 
+/** Pin a scroll box to its end on the next frame (one layout, not one per write). */
+function _scrollToEnd(el) {
+  requestAnimationFrame(() => { el.scrollTop = el.scrollHeight; });
+}
+
 function uid() { return Math.random().toString(36).slice(2, 9); }
 
 function blankCase() {
@@ -103,16 +123,27 @@ registerPlugin({
 
   init(container) {
     this._c = container;
+    // Status pushes that arrived in the background are rendered once on return
+    this._onVisible = () => {
+      if (document.hidden || !_hiddenStatus) return;
+      const s = _hiddenStatus;
+      _hiddenStatus = null;
+      this._updateStatusUI(s);
+    };
+    document.addEventListener("visibilitychange", this._onVisible);
     this._boot();
   },
 
   destroy() {
     if (_ws) { try { _ws.close(); } catch {} _ws = null; }
+    document.removeEventListener("visibilitychange", this._onVisible);
+    _hiddenStatus = null;
   },
 
   async _boot() {
     try {
       _catalog = await api(`/api/${PLUGIN_ID}/catalog`);
+      _catalogByType = new Map(_catalog.map(c => [c.type, c]));
       _cases = await api(`/api/${PLUGIN_ID}/cases`);
     } catch (e) {
       this._c.innerHTML = "";
@@ -321,7 +352,7 @@ registerPlugin({
       e.preventDefault();
       seqArea.classList.remove("drag-over");
       if (_dragData?.source === "palette") {
-        const catItem = _catalog.find(c => c.type === _dragData.type);
+        const catItem = _catalogByType.get(_dragData.type);
         if (catItem) {
           cs.steps.push({
             _id: uid(),
@@ -359,7 +390,7 @@ registerPlugin({
     }
 
     cs.steps.forEach((step, idx) => {
-      const catItem = _catalog.find(c => c.type === step.type) || {};
+      const catItem = _catalogByType.get(step.type) || {};
       const stepEl = h("div", {
         className: "utt-step-item",
         draggable: "true",
@@ -393,7 +424,7 @@ registerPlugin({
           cs.steps.splice(idx, 0, moved);
           this._renderSequence(seqArea, cs);
         } else if (_dragData?.source === "palette") {
-          const catInsert = _catalog.find(c => c.type === _dragData.type);
+          const catInsert = _catalogByType.get(_dragData.type);
           if (catInsert) {
             cs.steps.splice(idx, 0, {
               _id: uid(),
@@ -651,6 +682,8 @@ registerPlugin({
     statusCard.appendChild(stepsBox);
 
     const logBox = h("pre", { className: "utt-log-box", id: "utt-log-box" });
+    _logLineCount = 0;
+    _logChunkLines.length = 0;
     statusCard.appendChild(logBox);
 
     container.appendChild(statusCard);
@@ -672,17 +705,14 @@ registerPlugin({
     const logBox = document.getElementById("utt-log-box");
     const stepsBox = document.getElementById("utt-steps-progress");
     if (!body) return;
+    // Read scroll metrics before the DOM writes below – reading them after
+    // would force a synchronous layout of the freshly rebuilt card.
+    // Follow the tail only if the user hasn't scrolled up to read.
+    const atBottom = !!logBox && logBox.scrollTop + logBox.clientHeight >= logBox.scrollHeight - 4;
     body.innerHTML = "";
 
-    const badge = (text, cls) => h("span", { className: `utt-badge utt-badge-${cls}` }, text);
-
-    const statusBadge = {
-      idle: badge("Idle", "idle"),
-      running: badge("Running", "running"),
-      completed: badge("Completed", "success"),
-      failed: badge("Failed", "error"),
-      stopped: badge("Stopped", "warn"),
-    }[status.status] || badge(status.status, "idle");
+    const [label, cls] = STATUS_BADGES[status.status] || [status.status, "idle"];
+    const statusBadge = h("span", { className: `utt-badge utt-badge-${cls}` }, label);
 
     const info = h("div", { className: "utt-status-info" },
       h("div", null, h("strong", null, "Status: "), statusBadge),
@@ -769,16 +799,10 @@ registerPlugin({
 
     body.appendChild(info);
     if (stepsBox) {
-      stepsBox.innerHTML = "";
-      const stepIcons = {
-        pending: "○",
-        running: "◉",
-        passed: "✓",
-        failed: "✗",
-      };
-
+      // Assemble off-document and swap in once – one mutation per update
+      const frag = document.createDocumentFragment();
       const renderStepRow = (step) => {
-        const icon = stepIcons[step.status] || "○";
+        const icon = STEP_ICONS[step.status] || "○";
         const cls = step.status || "pending";
         const row = h(
           "div",
@@ -819,60 +843,48 @@ registerPlugin({
               resultText,
             ),
           );
-          stepsBox.appendChild(header);
+          frag.appendChild(header);
           for (const step of pastRun.steps) {
-            stepsBox.appendChild(renderStepRow(step));
+            frag.appendChild(renderStepRow(step));
           }
         }
       }
 
-      // Render the current, active iteration
-      if (status.running && status.steps?.length) {
+      // Render the current iteration (the last one is never moved to history)
+      if (status.steps?.length) {
         const header = h(
           "h4",
           { className: "utt-iteration-header" },
-          `Iteration ${status.current_iteration} (Running)`,
+          `Iteration ${status.current_iteration}${status.running ? " (Running)" : ""}`,
         );
-        stepsBox.appendChild(header);
+        frag.appendChild(header);
         for (const step of status.steps) {
-          stepsBox.appendChild(renderStepRow(step));
+          frag.appendChild(renderStepRow(step));
         }
       }
-    }
-
-    // Render step progress
-    if (stepsBox && status.steps?.length) {
-      stepsBox.innerHTML = "";
-      const stepIcons = { pending: "○", running: "◉", passed: "✓", failed: "✗" };
-
-      for (const step of status.steps) {
-        const icon = stepIcons[step.status] || "○";
-        const cls = step.status || "pending";
-        const row = h("div", { className: `utt-step-progress utt-sp-${cls}` },
-          h("span", { className: "utt-sp-icon" }, icon),
-          h("span", { className: "utt-sp-num" }, `${step.index + 1}`),
-          h("span", { className: "utt-sp-label" }, step.label),
-        );
-        if (step.detail) {
-          row.appendChild(h("span", { className: "utt-sp-detail" }, step.detail));
-        }
-        if (step.result) {
-          row.appendChild(h("span", { className: `utt-sp-result utt-sp-${cls}` }, step.result));
-        }
-        stepsBox.appendChild(row);
-      }
+      stepsBox.replaceChildren(frag);
     }
 
     // Update log
     if (logBox) {
       if (status.new_lines?.length) {
-        for (const line of status.new_lines) {
-          logBox.textContent += line + "\n";
+        // Append one text node – `textContent +=` re-serialises the whole log per line
+        logBox.appendChild(document.createTextNode(status.new_lines.join("\n") + "\n"));
+        _logLineCount += status.new_lines.length;
+        _logChunkLines.push(status.new_lines.length);
+        // Evict whole old chunks so layout cost stays bounded on long runs;
+        // their sizes are on record, so evicting never rescans the text
+        while (_logLineCount > LOG_MAX_LINES && logBox.firstChild !== logBox.lastChild) {
+          _logLineCount -= _logChunkLines.shift() ?? 1;
+          logBox.firstChild.remove();
         }
-        logBox.scrollTop = logBox.scrollHeight;
-      } else if (status.log_tail?.length && !logBox.textContent) {
+        if (atBottom) _scrollToEnd(logBox);
+      } else if (status.log_tail?.length && !logBox.firstChild) {
         logBox.textContent = status.log_tail.join("\n");
-        logBox.scrollTop = logBox.scrollHeight;
+        _logLineCount = status.log_tail.length;
+        _logChunkLines.length = 0;
+        _logChunkLines.push(_logLineCount);
+        _scrollToEnd(logBox);
       }
     }
   },
@@ -884,6 +896,14 @@ registerPlugin({
     _ws.onmessage = (evt) => {
       try {
         const data = JSON.parse(evt.data);
+        if (document.hidden) {
+          // Nobody is looking – keep the newest snapshot and the unseen log lines
+          if (_hiddenStatus?.new_lines?.length) {
+            data.new_lines = _hiddenStatus.new_lines.concat(data.new_lines || []).slice(-LOG_MAX_LINES);
+          }
+          _hiddenStatus = data;
+          return;
+        }
         this._updateStatusUI(data);
       } catch {}
     };
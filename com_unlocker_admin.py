@@ -57,9 +57,12 @@ def create_admin_app():
     from app.plugins.com_unlocker import plugin as com_plugin
     com_plugin.register_routes(app)
 
+    # Page (inline CSS + JS) is encoded once instead of on every request
+    page = _STANDALONE_HTML.encode("utf-8")
+
     @app.get("/", response_class=HTMLResponse)
     async def index():
-        return _STANDALONE_HTML
+        return HTMLResponse(page)
 
     return app
 
@@ -11,6 +11,8 @@ if ROOT_DIR not in sys.path:
 from server_app.teltonika_server import TeltonikaServer
 
 CONFIG_PATH = os.path.join(ROOT_DIR, 'toolkit_settings.json')
+# Current key first, then the legacy name
+_PORT_KEYS = ('server_port', 'tcp_port')
 
 def _load_server_init_config():
     defaults = {'server_port': 8000, 'server_protocol': 'TCP'}
@@ -19,7 +21,8 @@ def _load_server_init_config():
             with open(CONFIG_PATH, 'r') as f:
                 cfg = json.load(f)
             return {
-                'server_port': cfg.get('server_port', cfg.get('tcp_port', defaults['server_port'])),
+                'server_port': next((cfg[k] for k in _PORT_KEYS if cfg.get(k)),
+                                    defaults['server_port']),
                 'server_protocol': cfg.get('server_protocol', defaults['server_protocol']),
             }
     except Exception:
@@ -1,10 +1,5 @@
 import re
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import folium
-from folium.plugins import TimestampedGeoJson
 from datetime import datetime
 from . import gps_codes
 
@@ -1366,8 +1361,13 @@ def parse_log(content_str, progress_callback=None):
 
     return data_points, events, structured_logs, modem_info
 
+# Chart/map libraries are imported by the functions that draw with them:
+# parse_log() and the empty-state page render never need folium or plotly.
+
 def create_map(data):
     if not data: return None
+    import folium
+    from folium.plugins import TimestampedGeoJson
     
     start_loc = data[0]['loc']
     m = folium.Map(location=start_loc, zoom_start=15, tiles="CartoDB positron")
@@ -1377,11 +1377,21 @@ def create_map(data):
     folium.PolyLine(path_coords, color="lightgray", weight=3, opacity=0.5).add_to(m)
 
     features = []
-    
+    # Only three marker colours exist – share their style dicts across points
+    styles = {}
+
     for point in data:
         # Use existing logic, but current_ignition is now more accurate from TRIP logs
         color = get_marker_color(point['speed'], point['ignition'])
-        
+        style = styles.get(color)
+        if style is None:
+            style = styles[color] = ({'color': color}, {
+                'fillColor': color,
+                'fillOpacity': 1,
+                'stroke': 'false',
+                'radius': 6
+            })
+
         feature = {
             'type': 'Feature',
             'geometry': {
@@ -1390,14 +1400,9 @@ def create_map(data):
             },
             'properties': {
                 'time': point['time_iso'],
-                'style': {'color': color},
+                'style': style[0],
                 'icon': 'circle',
-                'iconstyle': {
-                    'fillColor': color,
-                    'fillOpacity': 1,
-                    'stroke': 'false',
-                    'radius': 6
-                },
+                'iconstyle': style[1],
                 'popup': f"<b>{point['speed_str']}</b><br>Ignition: {point['ignition']}"
             }
         }
@@ -1441,6 +1446,7 @@ def create_map(data):
 def create_timeline(events):
     if not events:
         return None
+    import plotly.graph_objects as go
         
     df_events = pd.DataFrame(events)
     if df_events.empty:
@@ -1473,21 +1479,22 @@ def create_timeline(events):
     if df_events.empty:
         return None
 
+    # Hover text is templated by plotly.js from customdata when a point is
+    # hovered, instead of one pre-built HTML string per event shipped to it
+    hover_template = (
+        "<b>%{y}</b><br>"
+        "Value: %{customdata[2]}<br>"
+        "Details: %{customdata[1]}<br>"
+        "Time: %{x|%H:%M:%S.%L}<br>"
+        "Line: %{customdata[3]}<extra></extra>"
+    )
+
     # Use graph_objects for better performance with large datasets (WebGL)
     fig = go.Figure()
     
     # Group by Type to assign colors and maintain legend
     for event_type, group in df_events.groupby("Type"):
         color = color_map.get(event_type, '#888888')
-        
-        # Create hover text
-        hover_text = (
-            "<b>" + group["Type"] + "</b><br>" +
-            "Value: " + group["Value"].astype(str) + "<br>" +
-            "Details: " + group["Details"].astype(str) + "<br>" +
-            "Time: " + group["Timestamp"].dt.strftime('%H:%M:%S.%f').str[:-3] + "<br>" +
-            "Line: " + group["LineNum"].astype(str)
-        )
 
         fig.add_trace(go.Scattergl(
             x=group["Timestamp"],
@@ -1499,8 +1506,7 @@ def create_timeline(events):
                 line=dict(width=1, color='DarkSlateGrey')
             ),
             name=event_type,
-            text=hover_text,
-            hoverinfo="text",
+            hovertemplate=hover_template,
             customdata=group[["Log", "Details", "Value", "LineNum"]],
         ))
 
@@ -1532,6 +1538,8 @@ def create_signal_chart(signal_readings):
     """Create a signal strength chart from parsed signal data."""
     if not signal_readings:
         return None
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
 
     df = pd.DataFrame(signal_readings)
     df['Timestamp'] = pd.to_datetime(df['Timestamp'], format='%Y/%m/%d %H:%M:%S:%f', errors='coerce')
@@ -1594,6 +1602,7 @@ def create_state_timeline(events):
     """Create a swimlane/Gantt-style state timeline showing device state durations."""
     if not events:
         return None
+    import plotly.express as px
 
     STATE_COLORS = {
         # Ignition
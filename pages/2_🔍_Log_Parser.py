@@ -1,5 +1,6 @@
 import re as _re
 import streamlit as st
+import streamlit.components.v1 as components
 import pandas as pd
 import os
 import sys
@@ -13,6 +14,7 @@ import html as _html
 import glob as glob_mod
 import pickle
 import subprocess
+import importlib.util
 from pathlib import Path
 from datetime import datetime
 
@@ -24,9 +26,11 @@ try:
         create_signal_chart, create_state_timeline,
         CREG_STATES, NETWORK_ACT, REC_SEND_STATES,
     )
-    import folium
-    from streamlit_folium import st_folium
-    import plotly.express as px
+    # Check the map/chart stack is installed without importing it – it is
+    # only loaded once there is parsed data to draw
+    for _dep in ('folium', 'plotly'):
+        if importlib.util.find_spec(_dep) is None:
+            raise ImportError(f"No module named '{_dep}'")
     DEPENDENCIES_OK = True
 except ImportError as e:
     DEPENDENCIES_OK = False
@@ -42,15 +46,19 @@ ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DEFAULT_JIRA_BASE = 'https://teltonika-telematics.atlassian.net'
 _RX_TICKET = _re.compile(r'[A-Z]{2,10}-\d+')  # e.g. FMBP-54666
 
+_TOOLKIT_SETTINGS_PATH = os.path.join(ROOT_DIR, 'toolkit_settings.json')
+# Defaults are pure data – built once at import, copied per call
+_DEFAULT_TOOLKIT_SETTINGS = {
+    'catcher_path': os.path.join(ROOT_DIR, 'easy-catcher', 'catcher_mod', 'Catcher.exe'),
+    'clg2txt_path': os.path.join(ROOT_DIR, 'easy-catcher', 'catcher_mod', 'Clg2Txt.exe'),
+    'db_path': '',
+    'tickets_folder': '',
+    'jira_base_url': DEFAULT_JIRA_BASE,
+}
+
 def load_toolkit_settings():
-    config_path = os.path.join(ROOT_DIR, 'toolkit_settings.json')
-    default = {
-        'catcher_path': os.path.join(ROOT_DIR, 'easy-catcher', 'catcher_mod', 'Catcher.exe'),
-        'clg2txt_path': os.path.join(ROOT_DIR, 'easy-catcher', 'catcher_mod', 'Clg2Txt.exe'),
-        'db_path': '',
-        'tickets_folder': '',
-        'jira_base_url': DEFAULT_JIRA_BASE,
-    }
+    config_path = _TOOLKIT_SETTINGS_PATH
+    default = dict(_DEFAULT_TOOLKIT_SETTINGS)
     if not os.path.exists(config_path):
         return default
     try:
@@ -71,7 +79,7 @@ def load_toolkit_settings():
 
 def save_toolkit_settings(settings):
     try:
-        with open(os.path.join(ROOT_DIR, 'toolkit_settings.json'), 'w', encoding='utf-8') as f:
+        with open(_TOOLKIT_SETTINGS_PATH, 'w', encoding='utf-8') as f:
             json.dump(settings, f, indent=4)
         return True
     except Exception as e:
@@ -396,6 +404,9 @@ def restore_from_cache(parsed_cache, display_name):
     
     # Re-hydrate DataFrames
     st.session_state['df_events'] = pd.DataFrame(ev_list) if ev_list else pd.DataFrame()
+    st.session_state.pop('df_events_text', None)
+    for k in ('map_html', 'map_speeds'):   # map tab rebuilds them for this parse
+        st.session_state.pop(k, None)
     st.session_state['df_structured_logs'] = pd.DataFrame(log_list) if log_list else pd.DataFrame()
     
     # Restore or re-compute DF AT
@@ -435,6 +446,9 @@ def parse_and_store(content, file_name):
     
     # Pre-compute DataFrames for heavy tabs
     st.session_state['df_events'] = pd.DataFrame(events) if events else pd.DataFrame()
+    st.session_state.pop('df_events_text', None)
+    for k in ('map_html', 'map_speeds'):   # map tab rebuilds them for this parse
+        st.session_state.pop(k, None)
     st.session_state['df_structured_logs'] = pd.DataFrame(structured_logs) if structured_logs else pd.DataFrame()
     
     # Pre-compute AT Command DataFrame with ConvID
@@ -549,7 +563,9 @@ with tab_upload:
 
         if st.button("🔍 Parse", type="primary", use_container_width=True):
             with st.spinner("Parsing..."):
-                all_content = ""
+                # Decoded logs are collected and joined once – `+=` on a
+                # multi-MB str copies everything read so far per file
+                content_parts = []
                 parsed_name_parts = []
                 last_catcher_work_dir = None
 
@@ -558,7 +574,7 @@ with tab_upload:
 
                     if not is_zip:
                         # Plain log / txt
-                        all_content += uf.read().decode('utf-8', errors='ignore') + "\n"
+                        content_parts.append(uf.read().decode('utf-8', errors='ignore'))
                         parsed_name_parts.append(uf.name)
                     else:
                         # ZIP with .dmp files → Easy Catcher processing
@@ -625,7 +641,7 @@ with tab_upload:
                             continue
 
                         with open(output_log, 'rb') as lf:
-                            all_content += lf.read().decode('utf-8', errors='ignore') + "\n"
+                            content_parts.append(lf.read().decode('utf-8', errors='ignore'))
                         parsed_name_parts.append(f"{uf.name} → {os.path.basename(output_log)}")
 
                         st.session_state['ec_temp_root'] = temp_root
@@ -633,6 +649,7 @@ with tab_upload:
                         st.session_state['ec_proc_logs'] = proc_logs
                         last_catcher_work_dir = process_root
 
+                all_content = "\n".join(content_parts) + "\n" if content_parts else ""
                 if all_content.strip():
                     display_name = analysis_name.strip() or " + ".join(parsed_name_parts)
                     data_points, events, structured_logs, modem_info = parse_and_store(
@@ -1164,10 +1181,12 @@ with tab_modem:
                 else:
                     st.caption("Group data not available for conversation view.")
 
-            # Download
+            # Download – assemble the lines column-wise, not one Series per row
             at_text = "\n".join(
-                f"[{r['Timestamp']}] {r['Direction']:>4} | {r.get('Category',''):>10} | {r['Content']}"
-                for _, r in df_at_view.iterrows()
+                "[" + df_at_view['Timestamp'].astype(str) + "] "
+                + df_at_view['Direction'].astype(str).str.rjust(4) + " | "
+                + df_at_view['Category'].astype(str).str.rjust(10) + " | "
+                + df_at_view['Content'].astype(str)
             )
             st.download_button(
                 "💾 Download AT Log", data=at_text,
@@ -1202,16 +1221,29 @@ with tab_map:
         else:
             st.write(f"{len(data_points)} GPS points from **{source}**")
             try:
-                map_obj = create_map(data_points)
-                if map_obj:
-                    st_folium(map_obj, width=None, height=600,
-                              returned_objects=[], key='main_map')
+                # Every rerun of the page (any widget on any tab) lands here;
+                # only rebuild the folium map when a different parse is loaded
+                # (parse_and_store / restore_from_cache drop the cached map)
+                if 'map_html' not in st.session_state:
+                    map_obj = create_map(data_points)
+                    # Render the Leaflet document once per parse; reruns hand
+                    # the browser the identical string, so the iframe is kept
+                    # instead of being re-rendered and re-parsed every time
+                    st.session_state['map_html'] = (
+                        map_obj.get_root().render() if map_obj else None)
+                    # Speed column pulled out once for the metrics below
+                    st.session_state['map_speeds'] = np.fromiter(
+                        (p['speed'] for p in data_points), dtype=float, count=len(data_points))
+                map_html = st.session_state['map_html']
+                if map_html:
+                    components.html(map_html, height=600)
                     c1, c2, c3, c4 = st.columns(4)
+                    spd = st.session_state['map_speeds']
                     c1.metric("Points", len(data_points))
-                    speeds = [p['speed'] for p in data_points if p['speed'] > 0]
-                    c2.metric("Avg Speed", f"{sum(speeds)/len(speeds):.1f} km/h" if speeds else "0")
-                    c3.metric("Max Speed", f"{max(p['speed'] for p in data_points):.1f} km/h")
-                    moving = sum(1 for p in data_points if p['speed'] > 5)
+                    speeds = spd[spd > 0]
+                    c2.metric("Avg Speed", f"{speeds.mean():.1f} km/h" if speeds.size else "0")
+                    c3.metric("Max Speed", f"{spd.max():.1f} km/h")
+                    moving = int((spd > 5).sum())
                     c4.metric("Moving", f"{moving}/{len(data_points)}")
                 else:
                     st.warning("Could not generate map.")
@@ -1242,8 +1274,13 @@ with tab_events:
                     submitted = st.form_submit_button("🔍 Search", use_container_width=True)
 
             if search:
-                # Optimized search across all columns
-                mask = df_ev.astype(str).agg(' '.join, axis=1).str.contains(search, case=False, na=False)
+                # Optimized search across all columns.  The joined row text is
+                # built once per parsed file (every rerun used to rebuild it).
+                ev_text = st.session_state.get('df_events_text')
+                if ev_text is None:
+                    ev_text = df_raw_ev.astype(str).agg(' '.join, axis=1)
+                    st.session_state['df_events_text'] = ev_text
+                mask = ev_text.loc[df_ev.index].str.contains(search, case=False, na=False)
                 df_ev = df_ev[mask]
                 st.write(f"{len(df_ev)} matches")
 
@@ -11,8 +11,25 @@ import struct
 import datetime
 import select
 import json
+import mmap
 import os
-from collections import defaultdict
+import sys
+import functools
+from collections import defaultdict, deque
+
+try:
+    import orjson
+except ImportError:  # optional – stdlib json is used as fallback
+    orjson = None
+
+try:
+    from fastcrc import crc16 as _fastcrc16
+    # Every CRC check goes through it – only trust it if it computes
+    # CRC-16/ARC (the standard check value for b"123456789" is 0xBB3D)
+    if _fastcrc16.arc(b"123456789") != 0xBB3D:
+        _fastcrc16 = None
+except Exception:  # optional – the table-driven crc16 below is the fallback
+    _fastcrc16 = None
 
 
 # ─── IO element name registry ──────────────────────────────────────────────────
@@ -30,24 +47,57 @@ _BUILTIN_IO_NAMES: dict[int, str] = {
 IO_ELEMENT_NAMES: dict[int, str] = dict(_BUILTIN_IO_NAMES)
 
 
+def _avl_cache_file() -> str:
+    return os.path.join(os.path.dirname(STATE_FILE), 'avl_ids_cache.json')
+
+
+def _read_avl_cache(source: list) -> dict[int, str] | None:
+    """Names from the JSON sidecar if it was built from this exact workbook."""
+    try:
+        with open(_avl_cache_file(), 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        if cache.get('source') == source:
+            return {int(k): v for k, v in cache['names'].items()}
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        pass
+    return None
+
+
+def _write_avl_cache(source: list, names: dict[int, str]):
+    try:
+        os.makedirs(os.path.dirname(_avl_cache_file()), exist_ok=True)
+        with open(_avl_cache_file(), 'w', encoding='utf-8') as f:
+            json.dump({'source': source, 'names': names}, f)
+    except OSError:
+        pass
+
+
 def load_avl_ids_from_excel(path: str) -> tuple[dict[int, str], str | None]:
     """Load IO element names from FMB_AVL_IDS.xlsx (MainTable sheet).
 
     Returns (id→name dict, error_string|None).
     The dict is keyed by column A (Property ID) with the *first* name found per ID.
+    openpyxl parses the sheet XML in pure Python, so the result is kept in a
+    JSON sidecar next to the server state and reused until the workbook's
+    path, mtime or size changes.
     """
-    import os
     if not os.path.isfile(path):
         return {}, f"File not found: {path}"
     try:
+        st = os.stat(path)
+        source = [os.path.abspath(path), st.st_mtime_ns, st.st_size]
+        names = _read_avl_cache(source)
+        if names is not None:
+            return names, None
+
         import openpyxl
         wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
         if 'MainTable' in wb.sheetnames:
             ws = wb['MainTable']
         else:
             ws = wb.active
-        names: dict[int, str] = {}
-        for row in ws.iter_rows(min_row=2, values_only=True):
+        names = {}
+        for row in ws.iter_rows(min_row=2, max_col=2, values_only=True):
             avl_id = row[0]
             prop_name = row[1]
             if avl_id is None or prop_name is None:
@@ -59,6 +109,7 @@ def load_avl_ids_from_excel(path: str) -> tuple[dict[int, str], str | None]:
             if avl_id not in names:
                 names[avl_id] = str(prop_name).strip()
         wb.close()
+        _write_avl_cache(source, names)
         return names, None
     except Exception as e:
         return {}, str(e)
@@ -96,6 +147,8 @@ _C = {
     'cmd_type': '#00897B', 'cmd_data': '#0277BD',
 }
 
+_CMD_TYPE_NAMES = {0x05: 'Command', 0x06: 'Response'}   # Codec 12/13 type byte
+
 _IO_COLORS = [
     '#00897B', '#5E35B1', '#C0CA33', '#F4511E', '#3949AB',
     '#43A047', '#E53935', '#1E88E5', '#8E24AA', '#FB8C00',
@@ -126,8 +179,7 @@ def _annotate_avl(data: bytes, off: int, n: int, codec_id: int,
             ts_s = off
             ts_ms = ru(8)
             try:
-                dt = datetime.datetime.utcfromtimestamp(ts_ms / 1000.0)
-                tstr = dt.strftime('%Y-%m-%d %H:%M:%S')
+                tstr = _utc_text(ts_ms)
             except Exception:
                 tstr = str(ts_ms)
             add(ts_s, off, f'{p}Time: {tstr}', _C['timestamp'])
@@ -229,7 +281,7 @@ def annotate_packet(raw_hex: str, protocol: str = 'TCP') -> list[dict]:
                 add(0, 1, 'IMEI Accept (0x01)', _C['ack'])
                 return sections
             if n == 4:
-                cnt = struct.unpack('!I', data)[0]
+                cnt = _U32.unpack_from(data)[0]
                 if cnt < 256:
                     add(0, 4, f'Data ACK (N={cnt})', _C['ack'])
                     return sections
@@ -246,13 +298,12 @@ def annotate_packet(raw_hex: str, protocol: str = 'TCP') -> list[dict]:
                 return sections
 
             if n >= 10 and data[0:4] != b'\x00\x00\x00\x00':
-                pl = struct.unpack('!H', data[0:2])[0]
+                pl, pid = _U16X2.unpack_from(data)
                 add(0, 2, f'Length ({pl})', _C['length'])
-                pid = struct.unpack('!H', data[2:4])[0]
                 add(2, 4, f'PktId ({pid})', _C['imei'])
                 add(4, 5, 'NotUsable', _C['preamble'])
                 add(5, 6, 'AvlPktId', _C['count'])
-                il = struct.unpack('!H', data[6:8])[0]
+                il = _U16.unpack_from(data, 6)[0]
                 add(6, 8, f'IMEI Len ({il})', _C['length'])
                 ie = 8 + il
                 if ie <= n:
@@ -277,8 +328,8 @@ def annotate_packet(raw_hex: str, protocol: str = 'TCP') -> list[dict]:
                 return sections
 
         # ── Framed packet (TCP or UDP command-response wrapper) ────────
-        if n >= 12 and struct.unpack('!I', data[0:4])[0] == 0:
-            dl = struct.unpack('!I', data[4:8])[0]
+        if n >= 12 and data[0:4] == b'\x00\x00\x00\x00':
+            dl = _U32.unpack_from(data, 4)[0]
             add(0, 4, 'Preamble', _C['preamble'])
             add(4, 8, f'DataLen ({dl})', _C['length'])
 
@@ -292,10 +343,10 @@ def annotate_packet(raw_hex: str, protocol: str = 'TCP') -> list[dict]:
                         add(off, off + 1, f'Qty ({data[off]})', _C['count']); off += 1
                     if off < n:
                         ct = data[off]
-                        tn = {0x05: 'Command', 0x06: 'Response'}.get(ct, f'0x{ct:02X}')
+                        tn = _CMD_TYPE_NAMES.get(ct) or f'0x{ct:02X}'
                         add(off, off + 1, tn, _C['cmd_type']); off += 1
                     if off + 4 <= n:
-                        cl = struct.unpack('!I', data[off:off + 4])[0]
+                        cl = _U32.unpack_from(data, off)[0]
                         add(off, off + 4, f'CmdLen ({cl})', _C['length']); off += 4
                         ce = min(off + cl, n)
                         if off < ce:
@@ -321,7 +372,7 @@ def annotate_packet(raw_hex: str, protocol: str = 'TCP') -> list[dict]:
 
             crc_s = 8 + dl
             if crc_s + 4 <= n:
-                cv = struct.unpack('!I', data[crc_s:crc_s + 4])[0]
+                cv = _U32.unpack_from(data, crc_s)[0]
                 add(crc_s, crc_s + 4, f'CRC (0x{cv:04X})', _C['crc'])
             total = 8 + dl + 4
             if total < n:
@@ -340,6 +391,42 @@ def annotate_packet(raw_hex: str, protocol: str = 'TCP') -> list[dict]:
 #  Protocol parser
 # ═══════════════════════════════════════════════════════════════════════════════
 
+# Precompiled big-endian layouts – unpack_from reads in place, no slice per field
+_U16 = struct.Struct('!H')
+_U32 = struct.Struct('!I')
+_U16X2 = struct.Struct('!HH')
+_U32X2 = struct.Struct('!II')          # TCP preamble + data length
+# Preamble(4) DataLen(4) Codec(1) Qty(1) Type(1) CmdLen(4) – Codec 12 command head
+_C12_HEAD = struct.Struct('!IIBBBI')
+# Timestamp(8) Priority(1) Lon(4) Lat(4) Alt(2) Angle(2) Sats(1) Speed(2)
+_AVL_HEADER = struct.Struct('!QBiihHBH')
+_UNPACK_UINT = {size: struct.Struct(f'!{fmt}').unpack_from
+                for size, fmt in ((1, 'B'), (2, 'H'), (4, 'I'), (8, 'Q'))}
+# (IO id, value) pairs of the 1/2/4/8-byte IO sections, keyed by id width
+# (1 B in Codec 8/16, 2 B in 8E) – a whole section unpacks in one C call
+_IO_PAIRS = {id_sz: tuple(struct.Struct(f'!{idf}{vf}') for vf in 'BHIQ')
+             for id_sz, idf in ((1, 'B'), (2, 'H'))}
+
+
+def _crc16_entry(byte: int) -> int:
+    crc = byte
+    for _ in range(8):
+        crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+    return crc
+
+
+def _utc_text(ts_ms: int) -> str:
+    """AVL timestamp (ms since epoch) as 'YYYY-MM-DD HH:MM:SS' UTC.
+
+    time.gmtime/strftime skip building a datetime per record.
+    """
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(ts_ms // 1000))
+
+
+# CRC-16/IBM (poly 0xA001 reflected) – one lookup per byte instead of 8 shifts
+_CRC16_TABLE = tuple(_crc16_entry(i) for i in range(256))
+
+
 class TeltonikaProtocol:
     """Complete Teltonika Protocol Parser – Codec 8 / 8E / 12 / 13."""
 
@@ -351,15 +438,13 @@ class TeltonikaProtocol:
 
     @staticmethod
     def crc16(data: bytes) -> int:
+        if _fastcrc16 is not None:
+            # Teltonika's CRC-16 is the ARC variant (init 0), not Modbus
+            return _fastcrc16.arc(data if type(data) is bytes else bytes(data))
+        table = _CRC16_TABLE
         crc = 0
-        poly = 0xA001
         for byte in data:
-            crc ^= byte
-            for _ in range(8):
-                if crc & 1:
-                    crc = (crc >> 1) ^ poly
-                else:
-                    crc >>= 1
+            crc = (crc >> 8) ^ table[(crc ^ byte) & 0xFF]
         return crc
 
     # ── IMEI / ping ────────────────────────────────────────────────────────────
@@ -380,11 +465,12 @@ class TeltonikaProtocol:
         """Parse a framed TCP data packet.
 
         Returns dict with type='data' | 'response' | 'crc_error' or None.
+        'raw' is the packet bytes – the RX hex is already kept by _add_raw(),
+        so callers that need text call .hex() themselves.
         """
         if len(packet) < 12:
             return None
-        preamble = struct.unpack('!I', packet[0:4])[0]
-        data_len = struct.unpack('!I', packet[4:8])[0]
+        preamble, data_len = _U32X2.unpack_from(packet)
         if preamble != 0 or data_len == 0 or data_len > 65535:
             return None
         total = 8 + data_len + 4
@@ -395,20 +481,20 @@ class TeltonikaProtocol:
 
         # CRC validation
         payload_for_crc = packet[8:8 + data_len]
-        recv_crc = struct.unpack('!I', packet[8 + data_len:total])[0]
+        recv_crc = _U32.unpack_from(packet, 8 + data_len)[0]
         calc_crc = TeltonikaProtocol.crc16(payload_for_crc)
         if recv_crc != calc_crc:
-            return {'type': 'crc_error', 'raw': packet.hex().upper()}
+            return {'type': 'crc_error', 'raw': packet}
 
         # Codec 12 / 13 – command response
         if codec_id in (TeltonikaProtocol.CODEC_12, TeltonikaProtocol.CODEC_13):
             cmd_type = packet[10]
             if cmd_type == 0x06:  # response
-                resp_len = struct.unpack('!I', packet[11:15])[0]
+                resp_len = _U32.unpack_from(packet, 11)[0]
                 resp_data = packet[15:15 + resp_len].decode('ascii', errors='ignore')
                 return {'type': 'response', 'codec': codec_id,
-                        'response': resp_data, 'raw': packet.hex().upper()}
-            return {'type': 'codec12_other', 'raw': packet.hex().upper()}
+                        'response': resp_data, 'raw': packet}
+            return {'type': 'codec12_other', 'raw': packet}
 
         # Codec 8 / 8E / 16 – AVL data
         if codec_id in (TeltonikaProtocol.CODEC_8, TeltonikaProtocol.CODEC_8E,
@@ -419,7 +505,7 @@ class TeltonikaProtocol:
             return {'type': 'data', 'codec': codec_id,
                     'codec_name': f'0x{codec_id:02X}',
                     'count': count1, 'records': records,
-                    'raw': packet.hex().upper()}
+                    'raw': packet}
 
         return None
 
@@ -440,11 +526,10 @@ class TeltonikaProtocol:
         if packet[0:4] == b'\x00\x00\x00\x00':
             return TeltonikaProtocol.parse_tcp_data_packet(packet)
 
-        pkt_len    = struct.unpack('!H', packet[0:2])[0]
-        pkt_id     = struct.unpack('!H', packet[2:4])[0]
+        pkt_len, pkt_id = _U16X2.unpack_from(packet)
         not_usable = packet[4]
         avl_pkt_id = packet[5]
-        imei_len   = struct.unpack('!H', packet[6:8])[0]
+        imei_len   = _U16.unpack_from(packet, 6)[0]
 
         if 8 + imei_len > len(packet):
             return None
@@ -471,7 +556,7 @@ class TeltonikaProtocol:
             'codec_name': f'0x{codec_id:02X}',
             'count': count1,
             'records': records,
-            'raw': packet.hex().upper(),
+            'raw': packet,
         }
 
     # ── AVL record decoding ───────────────────────────────────────────────────
@@ -479,66 +564,60 @@ class TeltonikaProtocol:
     def decode_avl_records(codec: int, data: bytes, count: int) -> list:
         records = []
         off = 0
+        n_data = len(data)
         is_8e = (codec == TeltonikaProtocol.CODEC_8E)
+        # IO id / count widths are fixed per codec – resolve once, not per record
+        id_sz  = 2 if is_8e else 1
+        cnt_sz = 2 if is_8e else 1
+        unpack_uint = _UNPACK_UINT
+        unpack_header = _AVL_HEADER.unpack_from
+        header_sz = _AVL_HEADER.size
+        io_pairs = _IO_PAIRS[id_sz]
+        view = memoryview(data)
 
         def ru(size):
+            # struct.error on a short buffer ends the decode like IndexError
             nonlocal off
-            if off + size > len(data):
-                raise IndexError
-            val = int.from_bytes(data[off:off + size], 'big', signed=False)
+            val = unpack_uint[size](data, off)[0]
             off += size
             return val
 
-        def rs(size):
+        def read_io_section(io_data, pair):
             nonlocal off
-            if off + size > len(data):
+            n = ru(cnt_sz)
+            end = off + n * pair.size
+            if end > n_data:
                 raise IndexError
-            val = int.from_bytes(data[off:off + size], 'big', signed=True)
-            off += size
-            return val
+            io_data.update(pair.iter_unpack(view[off:end]))
+            off = end
 
         try:
             for _ in range(count):
                 rec = {}
-                # Timestamp 8 B (ms since epoch)
-                ts_ms = ru(8)
-                dt = datetime.datetime.utcfromtimestamp(ts_ms / 1000.0)
-                rec['Timestamp'] = dt.strftime('%Y-%m-%d %H:%M:%S')
+                # Timestamp 8 B (ms since epoch), Priority 1 B, GPS 15 B
+                (ts_ms, prio, lon, lat, alt,
+                 angle, sats, speed) = unpack_header(data, off)
+                off += header_sz
+                rec['Timestamp'] = _utc_text(ts_ms)
                 rec['Timestamp_ms'] = ts_ms
+                rec['Priority'] = prio
 
-                # Priority 1 B
-                rec['Priority'] = ru(1)
-
-                # GPS 15 B
-                rec['Longitude']  = rs(4) / 10_000_000.0
-                rec['Latitude']   = rs(4) / 10_000_000.0
-                rec['Altitude']   = rs(2)
-                rec['Angle']      = ru(2)
-                rec['Satellites'] = ru(1)
-                rec['Speed']      = ru(2)
+                rec['Longitude']  = lon / 10_000_000.0
+                rec['Latitude']   = lat / 10_000_000.0
+                rec['Altitude']   = alt
+                rec['Angle']      = angle
+                rec['Satellites'] = sats
+                rec['Speed']      = speed
 
                 # IO elements
-                id_sz  = 2 if is_8e else 1
-                cnt_sz = 2 if is_8e else 1
-
                 event_io = ru(id_sz)
                 total_io = ru(cnt_sz)
                 rec['Event_IO'] = event_io
                 rec['Total_IO'] = total_io
 
                 io_data = {}
-
-                def read_io_section(val_size):
-                    n = ru(cnt_sz)
-                    for _ in range(n):
-                        io_id  = ru(id_sz)
-                        io_val = ru(val_size)
-                        io_data[io_id] = io_val
-
-                read_io_section(1)
-                read_io_section(2)
-                read_io_section(4)
-                read_io_section(8)
+                for pair in io_pairs:
+                    read_io_section(io_data, pair)
 
                 # Codec 8E NX variable-length elements
                 if is_8e:
@@ -546,9 +625,10 @@ class TeltonikaProtocol:
                     for _ in range(nx_count):
                         io_id  = ru(id_sz)
                         val_ln = ru(2)
-                        if off + val_ln > len(data):
+                        if off + val_ln > n_data:
                             raise IndexError
-                        io_data[io_id] = data[off:off + val_ln].hex().upper()
+                        # hex straight off a view – no intermediate bytes slice
+                        io_data[io_id] = view[off:off + val_ln].hex().upper()
                         off += val_ln
 
                 rec['IO_Data'] = io_data
@@ -563,27 +643,25 @@ class TeltonikaProtocol:
     def build_codec12_command(cmd_text: str) -> bytes:
         """Build a Codec 12 command packet (TCP-framed)."""
         cmd_bytes = cmd_text.encode('ascii')
-        payload = bytearray()
-        payload.append(TeltonikaProtocol.CODEC_12)  # codec
-        payload.append(0x01)   # qty 1
-        payload.append(0x05)   # type = command
-        payload += struct.pack('!I', len(cmd_bytes))
-        payload += cmd_bytes
-        payload.append(0x01)   # qty 2
-
-        crc = TeltonikaProtocol.crc16(bytes(payload))
-
-        pkt  = struct.pack('!I', 0)               # preamble
-        pkt += struct.pack('!I', len(payload))     # data field length
-        pkt += bytes(payload)
-        pkt += struct.pack('!I', crc)
-        return pkt
+        n = len(cmd_bytes)
+        data_len = 8 + n      # codec, qty 1, type, cmd length(4), cmd, qty 2
+        # Whole frame written into one buffer; the CRC reads the data field
+        # in place through a memoryview
+        pkt = bytearray(8 + data_len + 4)
+        _C12_HEAD.pack_into(pkt, 0, 0, data_len,
+                            TeltonikaProtocol.CODEC_12, 0x01, 0x05, n)
+        head = _C12_HEAD.size
+        pkt[head:head + n] = cmd_bytes
+        pkt[head + n] = 0x01  # qty 2
+        crc = TeltonikaProtocol.crc16(memoryview(pkt)[8:8 + data_len])
+        _U32.pack_into(pkt, 8 + data_len, crc)
+        return bytes(pkt)
 
     # ── ACK builders ──────────────────────────────────────────────────────────
     @staticmethod
     def build_tcp_data_ack(record_count: int) -> bytes:
         """4-byte TCP data ACK: 00 00 00 {N}."""
-        return struct.pack('!I', record_count)
+        return _U32.pack(record_count)
 
     @staticmethod
     def build_udp_data_ack(pkt_id: int, not_usable: int,
@@ -594,7 +672,7 @@ class TeltonikaProtocol:
         resp = bytearray(7)
         resp[0] = 0x00
         resp[1] = 0x05
-        struct.pack_into('!H', resp, 2, pkt_id)   # big-endian echo
+        _U16.pack_into(resp, 2, pkt_id)   # big-endian echo
         resp[4] = not_usable & 0xFF
         resp[5] = avl_pkt_id & 0xFF
         resp[6] = record_count & 0xFF
@@ -625,6 +703,42 @@ class _QueuedCommand:
 #  Server
 # ═══════════════════════════════════════════════════════════════════════════════
 
+_ts_cache = (None, '')  # (epoch second, 'HH:MM:SS') – swapped as one tuple
+
+
+def _log_ts() -> str:
+    """'HH:MM:SS.mmm' for log/raw/history entries; strftime runs once per second."""
+    global _ts_cache
+    t = time.time()
+    sec = int(t)
+    cached_sec, hms = _ts_cache
+    if sec != cached_sec:
+        hms = time.strftime('%H:%M:%S', time.localtime(sec))
+        _ts_cache = (sec, hms)
+    return f"{hms}.{int((t - sec) * 1000):03d}"
+
+
+# Store caps (newest first; older entries are dropped in place)
+_MAX_RECORDS = 2000
+_MAX_RAW = 1000
+_MAX_HISTORY = 1000
+
+_LOG_TEXT_MAX = 512  # longer device text is cropped in log lines (full copy is in command_history)
+
+
+def _clip(text: str, limit: int = _LOG_TEXT_MAX) -> str:
+    """Crop *text* for a single log line, noting how much was dropped."""
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}… (+{len(text) - limit} chars)"
+
+
+@functools.lru_cache(maxsize=1024)
+def _addr_label(addr: tuple) -> str:
+    """'ip:port' for a peer address – formatted once per address, not per poll."""
+    return f"{addr[0]}:{addr[1]}"
+
+
 STATE_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 
                           'output', 'server_state.json')
 
@@ -640,17 +754,25 @@ class TeltonikaServer:
         self.tcp_socket = None
         self.tcp_clients = {}
         self.tcp_imei = {}
+        self.tcp_sock_by_imei = {}  # IMEI → socket (reverse of tcp_imei)
         self.tcp_buffers = {}
 
         # UDP
         self.udp_socket = None
         self.udp_clients = {}  # IMEI → (addr, last_seen)
+        self.udp_imei_by_addr = {}  # addr → IMEI that last sent from it
 
         # Data stores (newest first)
         self.parsed_records  = []
         self.raw_messages    = []
         self.log_messages    = []
         self.command_history = []
+        self.max_log_lines = 1000   # log_messages cap (settable from the UI)
+        self._log_queue = deque()   # (line, entry) pairs waiting for _flush_logs
+        self._log_flush_lock = threading.Lock()
+        # Held only for the running check + append in log(); stop() takes it
+        # once so no queued line can slip in behind the final flush
+        self._log_queue_lock = threading.Lock()
 
         # Command queues
         self.command_queues: dict = defaultdict(list)
@@ -667,6 +789,8 @@ class TeltonikaServer:
         self.data_event = threading.Event()
         self._data_version = 0
         self._saved_version = 0
+        self._save_event = threading.Event()   # wakes _saver_loop early
+        self._save_lock = threading.Lock()     # one writer of STATE_FILE at a time
 
         # Load persisted state
         self.load_state()
@@ -681,13 +805,23 @@ class TeltonikaServer:
         if not os.path.exists(STATE_FILE):
             return
         try:
-            with open(STATE_FILE, 'r', encoding='utf-8') as f:
-                state = json.load(f)
+            if orjson is not None:
+                with open(STATE_FILE, 'rb') as f:
+                    if os.fstat(f.fileno()).st_size == 0:   # mmap rejects empty files
+                        return
+                    # Parse straight from the page cache – no bytes copy of the file
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, \
+                            memoryview(mm) as view:
+                        state = orjson.loads(view)
+            else:
+                with open(STATE_FILE, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
             with self.lock:
-                self.parsed_records = state.get('parsed_records', [])
-                self.raw_messages = state.get('raw_messages', [])
-                self.log_messages = state.get('log_messages', [])
-                self.command_history = state.get('command_history', [])
+                # Cap on load too – a state file may predate the current limits
+                self.parsed_records = state.get('parsed_records', [])[:_MAX_RECORDS]
+                self.raw_messages = state.get('raw_messages', [])[:_MAX_RAW]
+                self.log_messages = state.get('log_messages', [])[:self.max_log_lines]
+                self.command_history = state.get('command_history', [])[:_MAX_HISTORY]
                 # Restore scheduled commands if simple strings
                 sched = state.get('scheduled_commands', {})
                 self.scheduled_commands = defaultdict(list, sched)
@@ -698,51 +832,116 @@ class TeltonikaServer:
     def save_state(self):
         """Save logs/records to disk."""
         os.makedirs(os.path.dirname(STATE_FILE), exist_ok=True)
+        self._flush_logs()   # include lines still queued for the batch
         try:
-            with self.lock:
-                state = {
-                    'parsed_records': list(self.parsed_records),
-                    'raw_messages': list(self.raw_messages),
-                    'log_messages': list(self.log_messages),
-                    'command_history': list(self.command_history),
-                    'scheduled_commands': dict(self.scheduled_commands),
-                }
-                # Update saved version to avoid redundant saves
-                self._saved_version = self._data_version
-            
-            with open(STATE_FILE, 'w', encoding='utf-8') as f:
-                json.dump(state, f, default=str)
-                
+            # Snapshot and write under one _save_lock hold: a saver-thread save
+            # and a stop() save can't interleave and land an older snapshot last
+            with self._save_lock:
+                with self.lock:
+                    state = {
+                        'parsed_records': list(self.parsed_records),
+                        'raw_messages': list(self.raw_messages),
+                        'log_messages': list(self.log_messages),
+                        'command_history': list(self.command_history),
+                        'scheduled_commands': dict(self.scheduled_commands),
+                    }
+                    version = self._data_version
+
+                if orjson is not None:
+                    # OPT_NON_STR_KEYS: IO_Data is keyed by int, same as json.dump
+                    blob = orjson.dumps(state, default=str,
+                                        option=orjson.OPT_NON_STR_KEYS)
+                    with open(STATE_FILE, 'wb') as f:
+                        f.write(blob)
+                else:
+                    with open(STATE_FILE, 'w', encoding='utf-8') as f:
+                        json.dump(state, f, default=str)
+                # Only now is this version on disk – skips redundant saves
+                self._saved_version = version
+
         except Exception as e:
             print(f"Save state error: {e}")
 
+    def request_save(self):
+        """Have the saver thread persist state now (inline when stopped)."""
+        if self.running:
+            self._save_event.set()
+        else:
+            self.save_state()
+
     def _saver_loop(self):
-        """Background thread to save state periodically."""
+        """Background thread to save state periodically (sole writer while running)."""
         while self.running:
-            time.sleep(2)
+            self._save_event.wait(2)
+            self._save_event.clear()
             if self._data_version != self._saved_version:
                 self.save_state()
 
     # ── Logging ────────────────────────────────────────────────────────────────
+    def _log_flush_loop(self):
+        """Apply queued log lines every ~50 ms while running (final pass on stop)."""
+        while True:
+            time.sleep(0.05)
+            running = self.running
+            self._flush_logs()
+            if not running:
+                break
+
+    def _flush_logs(self):
+        """Fold queued log lines into log_messages and stdout in one batch.
+
+        Socket threads only append to a deque; the store lock, version bump and
+        console I/O (slow on Windows terminals) are paid once per batch here.
+        """
+        with self._log_flush_lock:   # saver and flusher thread both drain
+            q = self._log_queue
+            lines, entries = [], []
+            try:
+                while True:
+                    line, entry = q.popleft()
+                    lines.append(line)
+                    entries.append(entry)
+            except IndexError:
+                pass
+            if not entries:
+                return
+            out = sys.stdout
+            if out is not None:   # None under pythonw
+                try:
+                    out.write('\n'.join(lines) + '\n')
+                    out.flush()
+                except Exception:
+                    pass
+            entries.reverse()     # store is newest first
+            with self.lock:
+                self.log_messages[:0] = entries
+                del self.log_messages[self.max_log_lines:]
+                self._data_version += 1
+                self.data_event.set()
+
     def log(self, message: str, msg_type: str = "INFO"):
-        ts = datetime.datetime.now().strftime('%H:%M:%S.%f')[:-3]
-        print(f"[{ts}] [{msg_type}] {message}")
+        ts = _log_ts()
+        line = f"[{ts}] [{msg_type}] {message}"
         entry = {'timestamp': ts, 'type': msg_type, 'message': message}
+        if self.running:
+            with self._log_queue_lock:
+                if self.running:
+                    self._log_queue.append((line, entry))
+                    return
+        print(line)
         with self.lock:
             self.log_messages.insert(0, entry)
-            if len(self.log_messages) > 1000:
-                self.log_messages = self.log_messages[:1000]
+            del self.log_messages[self.max_log_lines:]
             self._data_version += 1
             self.data_event.set()
 
     def _add_raw(self, direction: str, data: bytes, protocol: str):
-        ts = datetime.datetime.now().strftime('%H:%M:%S.%f')[:-3]
+        ts = _log_ts()
         entry = {'timestamp': ts, 'direction': direction, 'protocol': protocol,
                  'hex': data.hex().upper(), 'length': len(data)}
         with self.lock:
             self.raw_messages.insert(0, entry)
-            if len(self.raw_messages) > 1000:
-                self.raw_messages = self.raw_messages[:1000]
+            del self.raw_messages[_MAX_RAW:]
             self._data_version += 1
             self.data_event.set()
 
@@ -786,6 +985,7 @@ class TeltonikaServer:
             threading.Thread(target=self._udp_server_loop, daemon=True).start()
         threading.Thread(target=self._command_sender_loop, daemon=True).start()
         threading.Thread(target=self._saver_loop, daemon=True).start()
+        threading.Thread(target=self._log_flush_loop, daemon=True).start()
         self.log(f"Server started – {self.protocol_mode} on port {self.port}", "START")
         return None
 
@@ -816,8 +1016,14 @@ class TeltonikaServer:
                 try: s.close()
                 except: pass
             self.tcp_clients.clear()
+            self.tcp_sock_by_imei.clear()
             self.tcp_imei.clear()
             self.tcp_buffers.clear()
+        # Any log() that saw running=True has appended once we hold this;
+        # later ones take the direct path, so the queue is complete here
+        with self._log_queue_lock:
+            pass
+        self._flush_logs()
         self.log("Server stopped", "STOP")
 
     # ═══════════════════════════════════════════════════════════════════════════
@@ -844,7 +1050,7 @@ class TeltonikaServer:
                                 client.setblocking(False)
                                 with self.lock:
                                     self.tcp_clients[client] = addr
-                                    self.tcp_buffers[client] = b''
+                                    self.tcp_buffers[client] = bytearray()
                                 self.log(f"TCP connect {addr[0]}:{addr[1]}", "CONN")
                             except:
                                 pass
@@ -854,7 +1060,7 @@ class TeltonikaServer:
                                 if chunk:
                                     self._add_raw("RX", chunk, "TCP")
                                     with self.lock:
-                                        self.tcp_buffers[s] = self.tcp_buffers.get(s, b'') + chunk
+                                        self.tcp_buffers.setdefault(s, bytearray()).extend(chunk)
                                     self._process_tcp_buffer(s)
                                 else:
                                     self._close_tcp(s)
@@ -874,30 +1080,40 @@ class TeltonikaServer:
             self.log(f"TCP bind error: {e}", "ERROR")
 
     def _process_tcp_buffer(self, sock):
+        # The select loop is the only writer of tcp_buffers[sock], so the
+        # bytearray is walked by offset and consumed bytes dropped in place
+        # once at the end – no re-slicing of the remainder per frame.
+        # Frames are copied out through a temporary memoryview: one copy
+        # into bytes instead of a bytearray slice that is then copied again.
         with self.lock:
-            buf = self.tcp_buffers.get(sock, b'')
+            buf = self.tcp_buffers.get(sock)
+        if not buf:
+            return
 
-        while len(buf) > 0:
-            # Magic kill packet for stale instance shutdown
-            if b'SERVER_DIE_NOW_PLEASE' in buf:
-                self.log("Received MAGIC KILL signal via TCP. Shutting down.", "STOP")
-                self.stop()
-                return
+        # Magic kill packet for stale instance shutdown
+        if b'SERVER_DIE_NOW_PLEASE' in buf:
+            self.log("Received MAGIC KILL signal via TCP. Shutting down.", "STOP")
+            self.stop()
+            return
 
+        pos = 0
+        end = len(buf)
+        while pos < end:
             # Ping
-            if buf[0] == 0xFF:
-                buf = buf[1:]
+            if buf[pos] == 0xFF:
+                pos += 1
                 continue
 
             # IMEI handshake (17 bytes: 00 0F + 15 ASCII)
-            if len(buf) >= 2 and buf[0:2] == b'\x00\x0F':
-                if len(buf) < 17:
+            if buf.startswith(b'\x00\x0F', pos):
+                if end - pos < 17:
                     break
-                imei = TeltonikaProtocol.parse_imei_packet(buf[:17])
-                buf = buf[17:]
+                imei = TeltonikaProtocol.parse_imei_packet(bytes(memoryview(buf)[pos:pos + 17]))
+                pos += 17
                 if imei:
                     with self.lock:
                         self.tcp_imei[sock] = imei
+                        self.tcp_sock_by_imei[imei] = sock
                     self.log(f"IMEI: {imei}", "IMEI")
                     try:
                         sock.send(b'\x01')
@@ -909,20 +1125,19 @@ class TeltonikaServer:
                 continue
 
             # Data / Command response frame
-            if len(buf) >= 8:
-                preamble = struct.unpack('!I', buf[0:4])[0]
-                data_len = struct.unpack('!I', buf[4:8])[0]
+            if end - pos >= 8:
+                preamble, data_len = _U32X2.unpack_from(buf, pos)
 
                 if preamble != 0 or data_len == 0 or data_len > 65535:
-                    buf = buf[1:]
+                    pos += 1
                     continue
 
                 total = 8 + data_len + 4
-                if len(buf) < total:
+                if end - pos < total:
                     break
 
-                pkt = buf[:total]
-                buf = buf[total:]
+                pkt = bytes(memoryview(buf)[pos:pos + total])
+                pos += total
                 info = TeltonikaProtocol.parse_tcp_data_packet(pkt)
 
                 if info is None or info.get('type') == 'crc_error':
@@ -943,18 +1158,17 @@ class TeltonikaServer:
                         self.log(f"Data ACK ({count})", "ACK")
                     except:
                         self._close_tcp(sock)
-                        with self.lock:
-                            self.tcp_buffers[sock] = buf
                         return
 
                     # Store records
+                    records = info.get('records', [])
+                    for rec in records:
+                        rec['IMEI'] = imei
+                        rec['Protocol'] = 'TCP'
                     with self.lock:
-                        for rec in info.get('records', []):
-                            rec['IMEI'] = imei
-                            rec['Protocol'] = 'TCP'
-                            self.parsed_records.insert(0, rec)
-                        if len(self.parsed_records) > 2000:
-                            self.parsed_records = self.parsed_records[:2000]
+                        # One front-insert per packet (newest first)
+                        self.parsed_records[:0] = records[::-1]
+                        del self.parsed_records[_MAX_RECORDS:]
                         if imei != 'Unknown':
                             self.interval_last_record[imei] = datetime.datetime.now()
                         self._data_version += 1
@@ -968,23 +1182,31 @@ class TeltonikaServer:
 
                 elif info['type'] == 'response':
                     resp = info['response']
-                    self.log(f"Response from {imei}: {resp}", "RESP")
+                    self.log(f"Response from {imei}: {_clip(resp)}", "RESP")
                     self._handle_command_response(imei, resp, 'TCP')
 
                 continue
 
             # Not enough data
-            if len(buf) > 16384:
+            if end - pos > 16384:
                 self.log("Buffer overflow – clearing", "ERROR")
-                buf = b''
+                pos = end
             break
 
         with self.lock:
-            self.tcp_buffers[sock] = buf
+            del buf[:pos]
 
     def _close_tcp(self, client):
         with self.lock:
             imei = self.tcp_imei.pop(client, None)
+            if imei is not None and self.tcp_sock_by_imei.get(imei) is client:
+                # An older connection for the same IMEI may still be open –
+                # fall back to it (newest surviving one) rather than dropping it
+                alive = [s for s, im in self.tcp_imei.items() if im == imei]
+                if alive:
+                    self.tcp_sock_by_imei[imei] = alive[-1]
+                else:
+                    del self.tcp_sock_by_imei[imei]
             self.tcp_clients.pop(client, None)
             self.tcp_buffers.pop(client, None)
         try:
@@ -1040,15 +1262,17 @@ class TeltonikaServer:
                         self.log(f"UDP ACK (PktId={info['udp_pkt_id']}, N={count})", "ACK")
 
                         # Store
+                        records = info.get('records', [])
+                        for rec in records:
+                            rec['IMEI'] = imei
+                            rec['Protocol'] = 'UDP'
+                        now = datetime.datetime.now()
                         with self.lock:
-                            self.udp_clients[imei] = (addr, datetime.datetime.now())
-                            for rec in info.get('records', []):
-                                rec['IMEI'] = imei
-                                rec['Protocol'] = 'UDP'
-                                self.parsed_records.insert(0, rec)
-                            if len(self.parsed_records) > 2000:
-                                self.parsed_records = self.parsed_records[:2000]
-                            self.interval_last_record[imei] = datetime.datetime.now()
+                            self.udp_clients[imei] = (addr, now)
+                            self.udp_imei_by_addr[addr] = imei
+                            self.parsed_records[:0] = records[::-1]
+                            del self.parsed_records[_MAX_RECORDS:]
+                            self.interval_last_record[imei] = now
                             self._data_version += 1
                             self.data_event.set()
 
@@ -1057,14 +1281,13 @@ class TeltonikaServer:
 
                     elif info.get('type') == 'response':
                         resp = info['response']
-                        imei = None
                         with self.lock:
-                            for i, (a, _) in self.udp_clients.items():
-                                if a == addr:
-                                    imei = i
-                                    break
+                            imei = self.udp_imei_by_addr.get(addr)
+                            # Only if that device hasn't since moved to another address
+                            if imei and self.udp_clients.get(imei, (None,))[0] != addr:
+                                imei = None
                         if imei:
-                            self.log(f"UDP response from {imei}: {resp}", "RESP")
+                            self.log(f"UDP response from {imei}: {_clip(resp)}", "RESP")
                             self._handle_command_response(imei, resp, 'UDP')
 
                 except Exception:
@@ -1153,12 +1376,11 @@ class TeltonikaServer:
                     q.pop(0)
 
             self.command_history.insert(0, {
-                'timestamp': datetime.datetime.now().strftime('%H:%M:%S.%f')[:-3],
+                'timestamp': _log_ts(),
                 'imei': imei, 'command': cmd_text, 'response': response,
                 'protocol': protocol, 'duration_ms': duration,
             })
-            if len(self.command_history) > 1000:
-                self.command_history = self.command_history[:1000]
+            del self.command_history[_MAX_HISTORY:]
             self.data_event.set()
 
         if qc and qc.callback:
@@ -1174,12 +1396,14 @@ class TeltonikaServer:
             try:
                 with self.lock:
                     imeis = list(self._active_cmd.keys())
+                # One clock read per sweep – compare every command to one cutoff
+                cutoff = datetime.datetime.now() - datetime.timedelta(seconds=30)
                 for imei in imeis:
                     with self.lock:
                         qc = self._active_cmd.get(imei)
                     if not qc or qc.status != 'waiting':
                         continue
-                    if qc.sent_time and (datetime.datetime.now() - qc.sent_time).total_seconds() > 30:
+                    if qc.sent_time and qc.sent_time < cutoff:
                         qc.retries += 1
                         if qc.retries >= qc.max_retries:
                             self.log(f"Command timeout for {imei}: {qc.command}", "ERROR")
@@ -1190,11 +1414,12 @@ class TeltonikaServer:
                                 if q and q[0] is qc:
                                     q.pop(0)
                                 self.command_history.insert(0, {
-                                    'timestamp': datetime.datetime.now().strftime('%H:%M:%S.%f')[:-3],
+                                    'timestamp': _log_ts(),
                                     'imei': imei, 'command': qc.command,
                                     'response': '⏱ TIMEOUT', 'protocol': self.protocol_mode,
                                     'duration_ms': -1,
                                 })
+                                del self.command_history[_MAX_HISTORY:]
                                 self.data_event.set()
                         else:
                             self.log(f"Retry {qc.retries}/{qc.max_retries} for {imei}", "CMD")
@@ -1216,7 +1441,8 @@ class TeltonikaServer:
             self.log_messages.clear()
             self.command_history.clear()
             self._data_version += 1
-        self.save_state()
+            self.data_event.set()
+        self.request_save()
 
     def send_command(self, imei: str, command: str) -> bool:
         """Queue & attempt to send a command. Always returns True (queued)."""
@@ -1231,23 +1457,22 @@ class TeltonikaServer:
 
     def _find_tcp_socket(self, imei: str):
         with self.lock:
-            for s, i in self.tcp_imei.items():
-                if i == imei and s in self.tcp_clients:
-                    return s
+            s = self.tcp_sock_by_imei.get(imei)
+            if s is not None and s in self.tcp_clients:
+                return s
         return None
 
     def is_device_connected(self, imei: str) -> bool:
         with self.lock:
-            for s, i in self.tcp_imei.items():
-                if i == imei and s in self.tcp_clients:
-                    return True
+            if self.tcp_sock_by_imei.get(imei) in self.tcp_clients:
+                return True
             info = self.udp_clients.get(imei)
             if info:
                 _, last = info
                 if (datetime.datetime.now() - last).total_seconds() < 300:
                     return True
                 else:
-                    del self.udp_clients[imei]
+                    self._drop_udp_client(imei)
         return False
 
     def get_connected_devices(self) -> list:
@@ -1255,10 +1480,10 @@ class TeltonikaServer:
         with self.lock:
             for sock, imei in self.tcp_imei.items():
                 if sock in self.tcp_clients:
-                    addr = self.tcp_clients[sock]
                     devices.append({
                         'IMEI': imei, 'Protocol': 'TCP',
-                        'Address': f"{addr[0]}:{addr[1]}", 'Status': 'Connected',
+                        'Address': _addr_label(self.tcp_clients[sock]),
+                        'Status': 'Connected',
                     })
             now = datetime.datetime.now()
             stale = []
@@ -1267,15 +1492,21 @@ class TeltonikaServer:
                 if age < 300:
                     devices.append({
                         'IMEI': imei, 'Protocol': 'UDP',
-                        'Address': f"{addr[0]}:{addr[1]}",
+                        'Address': _addr_label(addr),
                         'Status': f'Last seen {int(age)}s ago',
                     })
                 else:
                     stale.append(imei)
             for imei in stale:
-                del self.udp_clients[imei]
+                self._drop_udp_client(imei)
         return devices
 
+    def _drop_udp_client(self, imei: str):
+        """Forget a UDP device and its address mapping.  Caller holds self.lock."""
+        addr, _ = self.udp_clients.pop(imei)
+        if self.udp_imei_by_addr.get(addr) == imei:
+            del self.udp_imei_by_addr[addr]
+
     def get_queue_status(self, imei: str = None) -> dict:
         with self.lock:
             if imei:
@@ -23,6 +23,7 @@ import threading
 import subprocess
 import webbrowser
 from collections import deque
+from functools import lru_cache
 from typing import Optional
 
 # ── Ensure project root is on path ──────────────────────────────────
@@ -135,8 +136,8 @@ class ServerManager:
 
     def start(self):
         """Start the uvicorn server (non-blocking)."""
-        if self.running:
-            return
+        if self._thread is not None and self._thread.is_alive():
+            return   # running, or still importing the app / starting up
 
         _log_info("Starting server…")
 
@@ -214,8 +215,13 @@ def _log_info(msg: str):
 # ═══════════════════════════════════════════════════════════════════
 #  Tray icon generation
 # ═══════════════════════════════════════════════════════════════════
+@lru_cache(maxsize=None)
 def _create_icon_image(running: bool = True) -> Image.Image:
-    """Generate a 64x64 tray icon with the TK brand mark."""
+    """Generate a 64x64 tray icon with the TK brand mark.
+
+    Only two variants exist (running / stopped), so each is drawn once and
+    reused by the periodic icon refresh.
+    """
     size = 64
     img = Image.new("RGBA", (size, size), (0, 0, 0, 0))
     draw = ImageDraw.Draw(img)
@@ -328,6 +334,7 @@ class TrayApp:
     def __init__(self):
         self._icon: Optional[pystray.Icon] = None
         self._running = True
+        self._shown_state: Optional[tuple] = None   # (running, start_count) on display
 
     def _build_menu(self) -> pystray.Menu:
         """Build the context menu dynamically."""
@@ -425,9 +432,18 @@ class TrayApp:
         self._update_icon()
 
     def _update_icon(self):
-        """Refresh the tray icon image and menu."""
+        """Refresh the tray icon image and menu.
+
+        Skipped when nothing the icon or menu shows has changed – assigning
+        either makes pystray push a new icon/menu to the shell.
+        """
         if self._icon:
-            self._icon.icon = _create_icon_image(_server_mgr.running)
+            running = _server_mgr.running
+            state = (running, _server_mgr.start_count)
+            if state == self._shown_state:
+                return
+            self._shown_state = state
+            self._icon.icon = _create_icon_image(running)
             self._icon.menu = self._build_menu()
 
     def run(self):
@@ -439,20 +455,25 @@ class TrayApp:
         _active_port = _find_free_port()
         _log_info(f"Using port {_active_port}")
 
-        # Start server
-        _server_mgr.start()
-
-        # Create and run tray icon
+        # Show the tray icon straight away; importing the app and its
+        # plugins and starting the server happen in pystray's setup thread
         self._icon = pystray.Icon(
             name="alps-toolkit",
-            icon=_create_icon_image(_server_mgr.running),
+            icon=_create_icon_image(False),
             title=f"{APP_NAME} – {_server_mgr.url}",
             menu=self._build_menu(),
         )
+        self._shown_state = (False, _server_mgr.start_count)
 
-        # Open browser on first launch
-        if _server_mgr.running:
-            threading.Timer(1.5, lambda: webbrowser.open(_server_mgr.url)).start()
+        def _setup(icon):
+            icon.visible = True
+            _log_info("Tray icon active. Right-click for menu.")
+
+            self._do_start()
+
+            # Open browser on first launch
+            if _server_mgr.running:
+                threading.Timer(1.5, lambda: webbrowser.open(_server_mgr.url)).start()
 
         # Periodic icon refresh (to sync status)
         def _periodic_refresh():
@@ -465,8 +486,7 @@ class TrayApp:
 
         threading.Thread(target=_periodic_refresh, daemon=True, name="icon-refresh").start()
 
-        _log_info("Tray icon active. Right-click for menu.")
-        self._icon.run()
+        self._icon.run(setup=_setup)
 
 
 # ═══════════════════════════════════════════════════════════════════